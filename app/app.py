@@ -1,17 +1,20 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, send_file
 import cv2
 import numpy as np
 import os
 import base64
 import logging
+import uuid
 from datetime import datetime
 from ngrok import set_auth_token, connect
 import sys
+import argparse
 import subprocess
 from pydub import AudioSegment
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from main import EmotionAnalysisSystem
+from src.serving.prefork import PreforkServer, memory_usage
 
 # Настройка логирования
 logging.basicConfig(
@@ -25,12 +28,20 @@ os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
 
 app = Flask(__name__)
+# JSON без отступов и в режиме отладки: ответы с данными графиков отдаются часто
+app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+if hasattr(app, 'json'):
+    app.json.compact = True
 
 # Загружаем каскад Хаара для детекции лиц
 face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
 
-# Инициализируем систему анализа
-analysis_system = EmotionAnalysisSystem()
+# Инициализируем систему анализа; графики рендерятся отдельно, при первом запросе картинки,
+# модальности анализируются параллельно. Модели загружаются и прогреваются в фоне
+# после запуска сервера: он отвечает сразу, готовность видна на /health
+analysis_system = EmotionAnalysisSystem(
+    lazy_visualization=True, concurrent=True, lazy_models=True, partial_results=True
+)
 
 # Создаем необходимые директории
 os.makedirs('app/static/temp', exist_ok=True)
@@ -59,8 +70,9 @@ def upload_video():
         if not video_file:
             return jsonify({'error': 'Empty video file'}), 400
             
-        # Сохраняем файл временно
-        session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Сохраняем файл временно; случайный суффикс - загрузки в одну секунду
+        # не должны делить файлы и кэш графиков
+        session_id = f'{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:12]}'
         temp_path = os.path.join('app', 'static', 'temp', f'video_{session_id}.webm')
         os.makedirs(os.path.dirname(temp_path), exist_ok=True)
         video_file.save(temp_path)
@@ -81,19 +93,60 @@ def upload_video():
         if results is None:
             return jsonify({'error': 'Analysis failed'}), 500
 
-        # Формируем URL для визуализации
-        visualization_url = f'/static/temp/visualizations/visualization_video_{session_id}.webm.png'
+        # PNG не нужны для страницы результатов: графики строятся в браузере по results['charts'],
+        # картинка рендерится только при обращении к ее URL
+        visualization_urls = {
+            name: f'/visualization/{session_id}/{name}.png'
+            for name in results.get('visualizations', {})
+        }
         
-        return jsonify({
+        response = {
             'status': 'success',
-            'results': results,
-            'visualization_url': visualization_url
-        })
+            'session_id': session_id,
+            'charts': results['charts'],
+            'results_url': f'/results/{session_id}',
+            'visualization_url': visualization_urls.get('session'),
+            'visualization_urls': visualization_urls
+        }
+        # Полные результаты (с покадровыми шкалами) - только по явному запросу
+        if request.args.get('full'):
+            response['results'] = results
+        return jsonify(response)
         
     except Exception as e:
         logger.error(f"Error processing video: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/results/<session_id>')
+def session_results(session_id):
+    """Компактные данные графиков сессии для отрисовки в браузере"""
+    render_worker = analysis_system.render_worker
+    if os.path.basename(session_id) != session_id:
+        return jsonify({'error': 'Invalid session'}), 400
+    charts = render_worker.load_data(session_id, 'charts') if render_worker is not None else None
+    if charts is None:
+        return jsonify({'error': 'Unknown session'}), 404
+    return jsonify(charts)
+
+@app.route('/visualization/<session_id>/<name>.png')
+def visualization(session_id, name):
+    """Визуализация сессии: рендерится при первом запросе и берется из кэша"""
+    render_worker = analysis_system.render_worker
+    if render_worker is None or name not in render_worker.renderer_classes:
+        return jsonify({'error': 'Unknown visualization'}), 404
+    if os.path.basename(session_id) != session_id:
+        return jsonify({'error': 'Invalid session'}), 400
+
+    path = render_worker.get(session_id, name)
+    if path is None:
+        return jsonify({'error': 'Visualization is not available'}), 404
+    return send_file(path, mimetype='image/png')
+
+@app.route('/health')
+def health():
+    """Сервер отвечает до загрузки моделей; готовность и время загрузки - по модальностям"""
+    return jsonify(dict(analysis_system.readiness(), status='ok', pid=os.getpid(), memory=memory_usage()))
+
 @app.route('/check_face', methods=['POST'])
 def check_face():
     try:
@@ -132,6 +185,8 @@ def cleanup_temp_files():
                             os.unlink(file_path)
                 except Exception as e:
                     logger.error(f"Error deleting {file_path}: {e}")
+    if analysis_system.render_worker is not None:
+        analysis_system.render_worker.prune()
 
 def setup_ngrok():
     """Настройка ngrok"""
@@ -145,11 +200,32 @@ def setup_ngrok():
         logger.error(f"Ngrok setup failed: {e}")
         return None
 
+def serve_worker(sock):
+    """Воркер prefork-режима: WSGI-сервер на сокете, унаследованном от родителя"""
+    from werkzeug.serving import make_server
+    host, port = sock.getsockname()[:2]
+    make_server(host, port, app, threaded=True, fd=sock.fileno()).serve_forever()
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Multimodal emotion analysis web app')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='processes forked from a parent with shared PyTorch models')
+    args = parser.parse_args()
     try:
         cleanup_temp_files()
         public_url = setup_ngrok()
-        app.run(host='0.0.0.0', port=5000, debug=True)
+        if args.workers > 1:
+            # Модели речи и текста загружаются один раз в родителе и общие для воркеров (copy-on-write)
+            PreforkServer(
+                serve_worker,
+                port=5000,
+                workers=args.workers,
+                before_fork=analysis_system.share_models,
+                after_fork=lambda index: analysis_system.start_warmup()
+            ).run()
+        else:
+            analysis_system.start_warmup()
+            app.run(host='0.0.0.0', port=5000, debug=True)
     except Exception as e:
         logger.error(f"Server error: {e}")
     finally:
@@ -0,0 +1,456 @@
+"""
+Пакетный анализ записанных сессий.
+
+Обходит data/recordings/SESSION_ID/{video.mp4, audio.wav}, распределяет сессии
+по пулу процессов (в каждом свой EmotionAnalysisSystem) и записывает результат
+каждой сессии сразу по готовности - в JSONL или в части Parquet. Сессии, уже
+присутствующие в выходных данных, пропускаются, поэтому прерванный запуск
+продолжается повторным вызовом той же команды.
+
+Записи только добавляются: после --retry-failed у повторенной сессии две записи,
+действует последняя (last record wins) - при чтении результатов оставляйте
+последнюю запись каждого session_id.
+
+Пример:
+    python batch_analyze.py data/recordings results/sessions.jsonl --workers 4
+    python batch_analyze.py data/recordings results/sessions.parquet --format parquet
+"""
+import os
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+VIDEO_NAMES = ('video.mp4', 'video.webm', 'video.avi')
+AUDIO_NAME = 'audio.wav'
+
+# Система анализа процесса-воркера, создается один раз в инициализаторе пула
+_worker_system = None
+
+def discover_sessions(recordings_dir):
+    """
+    Сессии в каталоге записей: подкаталоги с видео; без audio.wav аудио берется из видео
+    :return: список {'session_id', 'video_path', 'audio_path'}, отсортированный по session_id
+    """
+    sessions = []
+    for session_id in sorted(os.listdir(recordings_dir)):
+        session_dir = os.path.join(recordings_dir, session_id)
+        if not os.path.isdir(session_dir):
+            continue
+        video_path = next(
+            (os.path.join(session_dir, name) for name in VIDEO_NAMES
+             if os.path.exists(os.path.join(session_dir, name))),
+            None
+        )
+        if video_path is None:
+            logger.warning(f"Skipping {session_dir}: no video file")
+            continue
+        audio_path = os.path.join(session_dir, AUDIO_NAME)
+        sessions.append({
+            'session_id': session_id,
+            'video_path': video_path,
+            'audio_path': audio_path if os.path.exists(audio_path) else video_path
+        })
+    return sessions
+
+def _to_builtin(value):
+    """Преобразование типов NumPy для json"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def session_record(session, results, full=False):
+    """
+    Запись сессии для выходного файла: агрегаты, транскрипт и компактные ряды charts
+    :param full: добавить полные результаты analyze_session (с покадровыми шкалами)
+    """
+    fusion_results = results['fusion_results'] or {}
+    record = {
+        'session_id': session['session_id'],
+        'status': 'ok',
+        'error': None,
+        'video_path': session['video_path'],
+        'audio_path': session['audio_path'],
+        'dominant': results['charts']['dominant'],
+        'emotions': {
+            'video': results['video_emotions']['average'],
+            'audio': results['speech_emotions']['average'],
+            'text': results['text_emotions']['emotions'],
+            'fused': fusion_results.get('emotions')
+        },
+        'confidence': fusion_results.get('confidence_scores'),
+        'transcript': results['text_emotions'].get('text'),
+        'charts': results['charts'],
+        'timings': results['timings'],
+        'errors': results.get('errors')
+    }
+    if full:
+        record['results'] = results
+    return record
+
+def failed_record(session, error):
+    return {
+        'session_id': session['session_id'],
+        'status': 'failed',
+        'error': error,
+        'video_path': session['video_path'],
+        'audio_path': session['audio_path']
+    }
+
+def _init_worker(options, threads):
+    """Инициализатор процесса пула: собственная система анализа и ограничение потоков torch"""
+    global _worker_system
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    from main import EmotionAnalysisSystem
+    _worker_system = EmotionAnalysisSystem(
+        quantize=options['quantize'],
+        translator=options['translator'],
+        branch_timeout=options['branch_timeout'],
+        concurrent=options['concurrent'],
+        partial_results=True,
+        visualize=False
+    )
+
+def _probe():
+    """Пустая задача: проверка, что инициализатор процесса пула отработал"""
+    return os.getpid()
+
+def _analyze_session(session, full):
+    """
+    Анализ одной сессии в процессе пула
+    :return: (успех, запись JSON) - сериализация в воркере, в родитель передается строка
+    """
+    started = time.perf_counter()
+    results = _worker_system.analyze_session(dict(session))
+    if results is None:
+        return False, json.dumps(failed_record(session, 'analysis failed'), ensure_ascii=False)
+    record = session_record(session, results, full)
+    record['seconds'] = round(time.perf_counter() - started, 3)
+    return True, json.dumps(record, ensure_ascii=False, default=_to_builtin)
+
+def _completed(latest, retry_failed):
+    """
+    :param latest: {session_id: статус последней записи}
+    :return: сессии, которые не нужно анализировать повторно
+    """
+    return {
+        session_id for session_id, status in latest.items()
+        if not (retry_failed and status == 'failed')
+    }
+
+class JsonlWriter:
+    """Построчная запись JSONL; каждая запись сбрасывается на диск сразу"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def completed(self, retry_failed=False):
+        """
+        session_id уже записанных сессий по последней записи каждой сессии
+        (оборванная последняя строка игнорируется)
+        """
+        latest = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    latest[record['session_id']] = record.get('status')
+        return _completed(latest, retry_failed)
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        return self
+
+    def write(self, line):
+        self._file.write(line + '\n')
+        self._file.flush()
+
+    def __exit__(self, *exc):
+        self._file.close()
+
+class ParquetWriter:
+    """
+    Запись в каталог частей Parquet: новый файл part-*.parquet каждые flush_every сессий
+    или flush_seconds секунд. Несброшенные строки теряются при аварийном завершении
+    родителя (SIGKILL, OOM) и анализируются заново при продолжении, поэтому части
+    небольшие; больше частей - медленнее чтение, их можно объединить после пакета.
+    Вложенные поля хранятся JSON-строками, верхний уровень - отдельными колонками
+    """
+
+    COLUMNS = ['session_id', 'status', 'error', 'video_path', 'audio_path', 'transcript',
+               'dominant', 'emotions', 'confidence', 'charts', 'timings', 'errors', 'seconds', 'results']
+
+    def __init__(self, path, flush_every=50, flush_seconds=60.0):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)")
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.path = path
+        self.flush_every = max(1, int(flush_every))
+        self.flush_seconds = flush_seconds
+        self._rows = []
+        self._last_flush = time.monotonic()
+
+    def completed(self, retry_failed=False):
+        """session_id уже записанных сессий по последней записи; части читаются в порядке записи"""
+        latest = {}
+        if os.path.isdir(self.path):
+            for name in sorted(os.listdir(self.path)):
+                if not name.endswith('.parquet'):
+                    continue
+                table = self.pq.read_table(os.path.join(self.path, name), columns=['session_id', 'status'])
+                latest.update(zip(table['session_id'].to_pylist(), table['status'].to_pylist()))
+        return _completed(latest, retry_failed)
+
+    def __enter__(self):
+        os.makedirs(self.path, exist_ok=True)
+        return self
+
+    def write(self, line):
+        record = json.loads(line)
+        self._rows.append({
+            column: json.dumps(record[column], ensure_ascii=False)
+            if isinstance(record.get(column), (dict, list)) else record.get(column)
+            for column in self.COLUMNS
+        })
+        if (len(self._rows) >= self.flush_every or
+                (self.flush_seconds is not None and time.monotonic() - self._last_flush >= self.flush_seconds)):
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if not self._rows:
+            return
+        table = self.pa.Table.from_pylist(
+            self._rows,
+            schema=self.pa.schema([
+                ('seconds', self.pa.float64()) if column == 'seconds' else (column, self.pa.string())
+                for column in self.COLUMNS
+            ])
+        )
+        # Временное имя и атомарная замена: прерванная запись не оставляет битую часть
+        # Имена сортируются в порядке записи: время, затем номер части
+        name = f"part-{time.strftime('%Y%m%d_%H%M%S')}-{len(os.listdir(self.path)):05d}-{os.getpid()}"
+        temp_path = os.path.join(self.path, name + '.tmp')
+        self.pq.write_table(table, temp_path)
+        os.replace(temp_path, os.path.join(self.path, name + '.parquet'))
+        self._rows = []
+
+    def __exit__(self, *exc):
+        self.flush()
+
+class BatchAnalyzer:
+    """Распределение сессий по пулу процессов и потоковая запись результатов"""
+
+    def __init__(self, workers=2, quantize=False, translator='google', branch_timeout=None,
+                 concurrent=False, full=False, max_attempts=2):
+        """
+        :param workers: процессов анализа (у каждого свои модели)
+        :param branch_timeout: ограничение времени ветки модальности в секундах
+        :param concurrent: модальности сессии параллельно внутри воркера
+        :param full: записывать полные результаты analyze_session
+        :param max_attempts: попыток сессии, если процесс воркера упал во время ее анализа.
+                             Падение засчитывается сессии, только если в пуле не было других:
+                             после падения с несколькими сессиями они повторяются по одной
+        """
+        self.workers = max(1, int(workers))
+        self.options = {
+            'quantize': quantize,
+            'translator': translator,
+            'branch_timeout': branch_timeout,
+            'concurrent': concurrent
+        }
+        self.full = full
+        self.max_attempts = max(1, int(max_attempts))
+
+    def _create_executor(self):
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        logger.info(f"Starting {self.workers} analysis workers ({threads} threads each)")
+        # spawn: fork процесса с уже инициализированными TensorFlow/torch может зависнуть
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self.options, threads)
+        )
+        # Ошибка инициализатора (например, не загрузилась модель) ломает пул так же, как
+        # падение воркера; без проверки каждая сессия записалась бы как упавшая
+        try:
+            executor.submit(_probe).result()
+        except BrokenProcessPool as e:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise RuntimeError("Analysis worker failed to initialize, see the worker error above") from e
+        return executor
+
+    def run(self, sessions, writer):
+        """
+        :param sessions: сессии из discover_sessions (уже без обработанных)
+        :param writer: JsonlWriter или ParquetWriter
+        :return: {'ok', 'failed', 'seconds'}
+        :raises RuntimeError: если процессы пула не инициализируются
+        """
+        stats = {'ok': 0, 'failed': 0}
+        started = time.perf_counter()
+        queue = list(reversed(sessions))
+        # Сессии, которые были в пуле при падении воркера: анализируются по одной
+        suspects = []
+        crashes = {}
+        # Ограничение числа задач в пуле: сессии не сериализуются в очередь все сразу
+        max_pending = self.workers * 2
+        executor = self._create_executor()
+        pending = {}
+
+        def record(line, session, failed):
+            writer.write(line)
+            stats['failed' if failed else 'ok'] += 1
+            done = stats['ok'] + stats['failed']
+            elapsed = time.perf_counter() - started
+            logger.info(
+                f"[{done}/{len(sessions)}] {session['session_id']}: {'failed' if failed else 'ok'} "
+                f"({done / elapsed:.2f} sessions/s)"
+            )
+
+        try:
+            while queue or suspects or pending:
+                if suspects:
+                    if not pending:
+                        session = suspects.pop()
+                        pending[executor.submit(_analyze_session, session, self.full)] = session
+                else:
+                    while queue and len(pending) < max_pending:
+                        session = queue.pop()
+                        pending[executor.submit(_analyze_session, session, self.full)] = session
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                crashed = []
+                for future in done:
+                    session = pending.pop(future)
+                    try:
+                        success, line = future.result()
+                    except BrokenProcessPool:
+                        crashed.append(session)
+                        continue
+                    except Exception as e:
+                        record(json.dumps(failed_record(session, str(e))), session, True)
+                        continue
+
+                    record(line, session, not success)
+
+                if crashed:
+                    # Процесс пула завершился аварийно (например, нехватка памяти): все задачи
+                    # пула потеряны, незавершенные сессии повторяются в новом пуле
+                    crashed += pending.values()
+                    pending = {}
+                    executor.shutdown(wait=False, cancel_futures=True)
+
+                    if len(crashed) == 1:
+                        session = crashed[0]
+                        crashes[session['session_id']] = crashes.get(session['session_id'], 0) + 1
+                        logger.error(f"Worker process crashed on session {session['session_id']}")
+                        if crashes[session['session_id']] < self.max_attempts:
+                            suspects.append(session)
+                        else:
+                            record(json.dumps(failed_record(session, 'worker process crashed')),
+                                   session, True)
+                    else:
+                        # Виновника не определить: сессии повторяются по одной без штрафа
+                        logger.error(
+                            f"Worker process crashed with {len(crashed)} sessions in flight, "
+                            f"retrying them one at a time"
+                        )
+                        suspects.extend(reversed(crashed))
+                    executor = self._create_executor()
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+        stats['seconds'] = round(time.perf_counter() - started, 1)
+        return stats
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk offline emotion analysis of recorded sessions')
+    parser.add_argument('recordings', nargs='?', default=os.path.join('data', 'recordings'),
+                        help='directory with SESSION_ID/{video.mp4,audio.wav}')
+    parser.add_argument('output', nargs='?', default=os.path.join('results', 'sessions.jsonl'),
+                        help='JSONL file or Parquet directory')
+    parser.add_argument('--format', choices=['jsonl', 'parquet'], default=None,
+                        help='output format (default: by output extension)')
+    parser.add_argument('--workers', type=int, default=2, help='analysis processes')
+    parser.add_argument('--limit', type=int, default=None, help='analyze at most N new sessions')
+    parser.add_argument('--retry-failed', action='store_true',
+                        help='analyze again sessions recorded as failed; the new record is appended '
+                             'and the last record of a session wins')
+    parser.add_argument('--full', action='store_true',
+                        help='store full analysis results including per-frame timelines')
+    parser.add_argument('--quantize', action='store_true', help='int8 dynamic quantization (CPU)')
+    parser.add_argument('--translator', default='google',
+                        help="translation backend: google, marian, dictionary or none")
+    parser.add_argument('--branch-timeout', type=float, default=None,
+                        help='time limit per modality branch, seconds')
+    parser.add_argument('--concurrent', action='store_true',
+                        help='run modality branches of a session concurrently inside a worker')
+    parser.add_argument('--flush-every', type=int, default=50,
+                        help='sessions per Parquet part file; unflushed sessions are lost and '
+                             're-analyzed if the process is killed, larger values mean fewer files')
+    parser.add_argument('--flush-seconds', type=float, default=60.0,
+                        help='also write a Parquet part at least this often, seconds')
+    args = parser.parse_args()
+
+    output_format = args.format or ('parquet' if args.output.endswith('.parquet') else 'jsonl')
+    writer = ParquetWriter(args.output, args.flush_every, args.flush_seconds) if output_format == 'parquet' \
+        else JsonlWriter(args.output)
+
+    sessions = discover_sessions(args.recordings)
+    completed = writer.completed(retry_failed=args.retry_failed)
+    todo = [session for session in sessions if session['session_id'] not in completed]
+    skipped = len(sessions) - len(todo)
+    if args.limit is not None:
+        todo = todo[:args.limit]
+    logger.info(
+        f"Found {len(sessions)} sessions, {skipped} already in {args.output}, analyzing {len(todo)}"
+    )
+    if not todo:
+        return
+
+    analyzer = BatchAnalyzer(
+        workers=args.workers,
+        quantize=args.quantize,
+        translator=None if args.translator == 'none' else args.translator,
+        branch_timeout=args.branch_timeout,
+        concurrent=args.concurrent,
+        full=args.full
+    )
+    try:
+        with writer:
+            stats = analyzer.run(todo, writer)
+    except RuntimeError as e:
+        logger.error(f"Batch aborted: {e}")
+        raise SystemExit(1)
+    logger.info(f"Batch completed: {stats}")
+
+if __name__ == "__main__":
+    main()
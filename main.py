@@ -1,10 +1,17 @@
-from src.facial_recognition.facial_emotion_detector import VideoEmotionAnalyzer
-from src.speech_recognition.speech_emotion import SpeechEmotionAnalyzer
-from src.text_analysis.sentiment_analyzer import TextEmotionAnalyzer
 from src.fusion.emotion_fusion import EmotionFusion
 from src.visualizer.visualizer import EmotionVisualizer
+from src.speech_recognition.audio_loader import load_audio
+from src.speech_recognition.voice_activity import VoiceActivityDetector
+from src.visualizer.render_worker import RenderWorker
+from src.visualizer.chart_data import build_chart_data
+from src.models.manager import ModelManager
+from src.serving.prefork import share_models
 import os
+import copy
+import time
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from typing import Dict, Optional
 
 # Настройка логирования
@@ -24,20 +31,134 @@ os.makedirs(TEMP_DIR, exist_ok=True)
 os.makedirs(VISUALIZATION_DIR, exist_ok=True)
 
 class EmotionAnalysisSystem:
-    def __init__(self):
-        """Инициализация всех компонентов системы"""
+    # Результаты модальности, анализ которой не удался: в объединении она не участвует
+    EMPTY_RESULTS = {
+        'video': {'average': {}, 'dominant_emotion': None, 'timeline': None},
+        'speech': {'average': {}, 'dominant_emotion': None, 'timeline': None},
+        'text': {'text': None, 'emotions': {}, 'dominant_emotion': None}
+    }
+
+    def __init__(self, quantize=False, translator='google', transcribe_workers=0,
+                 lazy_visualization=False, concurrent=False, branch_timeout=None,
+                 lazy_models=False, visualize=True, vad=True, partial_results=False):
+        """
+        Инициализация всех компонентов системы
+        :param quantize: int8-квантизация трансформерных моделей речи и текста
+                         (см. validation/check_quantization.py)
+        :param translator: бэкенд перевода транскрипта ('google', 'marian', 'dictionary' или None)
+        :param transcribe_workers: процессов для параллельного распознавания длинных записей
+        :param lazy_visualization: не строить графики во время анализа; они рендерятся
+                                   RenderWorker при первом запросе картинки
+        :param concurrent: анализ видео, речи и текста в параллельных потоках, по три потока
+                           на сессию (модели TensorFlow и PyTorch освобождают GIL во время вычислений)
+        :param branch_timeout: ограничение времени ветки модальности в секундах (None - без ограничения)
+        :param partial_results: неудачная модальность не прерывает анализ - она заменяется
+                                пустыми результатами, ошибка записывается в results['errors'].
+                                По умолчанию ошибка любой модальности дает None
+        :param lazy_models: не загружать модели в конструкторе; каждая модальность загружается
+                            при первом использовании или фоновым прогревом (start_warmup)
+        :param visualize: False - графики не строятся и не сохраняются (пакетный анализ,
+                          результатам достаточно компактных данных charts)
+        :param vad: отбрасывать тишину перед анализом речи и текста (False - анализ всей записи)
+        """
         try:
             logger.info("Initializing EmotionAnalysisSystem...")
-            self.video_analyzer = VideoEmotionAnalyzer()
-            self.speech_analyzer = SpeechEmotionAnalyzer()
-            self.text_analyzer = TextEmotionAnalyzer()
+            self.models = ModelManager(
+                self._model_loaders(quantize, translator, transcribe_workers)
+            )
+            if not lazy_models:
+                self.models.load_all()
+            self.vad = VoiceActivityDetector() if vad else None
             self.fusion = EmotionFusion()
             self.visualizer = EmotionVisualizer()
+            self.visualize = visualize
+            self.render_worker = RenderWorker() if lazy_visualization and visualize else None
+            self.branch_timeout = branch_timeout
+            self.partial_results = partial_results
+            self.concurrent = concurrent
+            # Ветки, брошенные по branch_timeout, но еще выполняющиеся в своих потоках
+            self._abandoned = set()
+            self._abandoned_lock = threading.Lock()
             logger.info("EmotionAnalysisSystem initialized successfully")
         except Exception as e:
             logger.error(f"Error initializing EmotionAnalysisSystem: {e}")
             raise
 
+    @staticmethod
+    def _model_loaders(quantize, translator, transcribe_workers):
+        """
+        Загрузчики анализаторов модальностей. Модули с TensorFlow и PyTorch
+        импортируются внутри загрузчиков, а не при импорте main
+        """
+        def load_video():
+            from src.facial_recognition.facial_emotion_detector import VideoEmotionAnalyzer
+            return VideoEmotionAnalyzer()
+
+        def load_speech():
+            from src.speech_recognition.speech_emotion import SpeechEmotionAnalyzer
+            return SpeechEmotionAnalyzer(quantize=quantize)
+
+        def load_text():
+            from src.text_analysis.sentiment_analyzer import TextEmotionAnalyzer
+            return TextEmotionAnalyzer(
+                quantize=quantize,
+                translator=translator,
+                transcribe_workers=transcribe_workers
+            )
+
+        return {'video': load_video, 'speech': load_speech, 'text': load_text}
+
+    @property
+    def video_analyzer(self):
+        return self.models.get('video')
+
+    @property
+    def speech_analyzer(self):
+        return self.models.get('speech')
+
+    @property
+    def text_analyzer(self):
+        return self.models.get('text')
+
+    def start_warmup(self):
+        """Фоновая загрузка и пробный прогон моделей всех модальностей"""
+        return self.models.start_warmup()
+
+    def share_models(self, names=('speech', 'text')):
+        """
+        Загрузка моделей PyTorch перед fork воркеров и перенос их весов в разделяемую память.
+        Модель видео (TensorFlow) не переносит fork после инициализации и загружается
+        в каждом воркере; прогрев тоже выполняется в воркерах, чтобы пулы потоков
+        torch не создавались в родителе
+        """
+        analyzers = [self.models.get(name) for name in names]
+        shared = share_models(analyzers)
+        logger.info(f"Shared {shared} PyTorch modules of {', '.join(names)} for forked workers")
+
+    def readiness(self) -> Dict:
+        """
+        Готовность моделей: {'ready': все загружены, 'models': состояние по модальностям,
+        'abandoned_branches': ветки, брошенные по branch_timeout и еще занимающие поток}
+        """
+        with self._abandoned_lock:
+            abandoned = len(self._abandoned)
+        return {'ready': self.models.is_ready(), 'models': self.models.status(),
+                'abandoned_branches': abandoned}
+
+    def _abandon(self, name, future):
+        """Учет ветки, результат которой больше не ждут; поток освобождается по ее окончании"""
+        def finished(_):
+            with self._abandoned_lock:
+                self._abandoned.discard(future)
+                left = len(self._abandoned)
+            logger.warning(f"Abandoned {name} branch finished, {left} still running")
+
+        with self._abandoned_lock:
+            self._abandoned.add(future)
+            count = len(self._abandoned)
+        logger.warning(f"{name.capitalize()} branch abandoned after timeout, {count} abandoned branches running")
+        future.add_done_callback(finished)
+
     def analyze_session(self, data: Dict) -> Optional[Dict]:
         """
         Анализ записанной сессии
@@ -46,58 +167,87 @@ class EmotionAnalysisSystem:
         """
         try:
             logger.info(f"Starting analysis for session with data: {data}")
-            
-            # 1. Анализ видео
-            logger.info("Analyzing video emotions...")
-            video_emotions = self.video_analyzer.analyze_video(data['video_path'])
-            if not video_emotions:
-                logger.error("Video analysis failed")
-                return None
-
-            # 2. Анализ аудио
-            logger.info("Analyzing speech emotions...")
-            speech_emotions = self.speech_analyzer.analyze_emotion(data['audio_path'])
-            if not speech_emotions:
-                logger.error("Speech analysis failed")
-                return None
+            started = time.perf_counter()
+            timings, errors = {}, {}
 
-            # 3. Анализ текста
-            logger.info("Analyzing text emotions...")
-            text_results = self.text_analyzer.process_audio(data['audio_path'])
-            if not text_results:
-                logger.error("Text analysis failed")
+            # 1-3. Анализ модальностей
+            branches = self._analyze_modalities(data, timings, errors)
+            if branches is None:
                 return None
+            audio, video_emotions, speech_emotions, text_results = branches
 
             # 4. Объединение результатов
             logger.info("Fusing emotion results...")
+            stage_started = time.perf_counter()
             fusion_results = self.fusion.fuse_emotions(
                 video_emotions['average'],
                 speech_emotions['average'],
                 text_results['emotions']
             )
+            temporal = None
+            if fusion_results is not None:
+                # Покадровое видео, окна речи и сегменты текста на общей сетке
+                temporal = self.fusion.fuse_temporal(
+                    video_emotions['timeline'],
+                    speech_emotions.get('timeline'),
+                    text_results.get('timeline')
+                )
+                fusion_results['timeline'] = self.fusion.temporal_records(temporal)
+            timings['fusion'] = time.perf_counter() - stage_started
 
-            # 5. Создание визуализации
-            logger.info("Creating visualization...")
-            visualization_path = os.path.join(
-                VISUALIZATION_DIR,
-                f'visualization_{os.path.basename(data["video_path"])}.png'
-            )
-            
-            self.visualizer.create_visualization(
-                video_emotions,
-                speech_emotions,
-                text_results,
-                fusion_results,
-                visualization_path
+            # Компактные данные для графиков в браузере
+            charts = build_chart_data(
+                video_emotions, speech_emotions, text_results, fusion_results, temporal
             )
 
+            # 5. Создание визуализации
+            stage_started = time.perf_counter()
+            visualizations = None
+            visualization_path = None
+            if self.render_worker is not None:
+                self.render_worker.save_data(self.session_id(data), 'charts', charts)
+                # Графики строятся по запросу, анализ возвращается сразу
+                visualizations = self._submit_visualizations(
+                    data, audio, video_emotions, speech_emotions, text_results, fusion_results
+                )
+                visualization_path = visualizations['session']
+            elif self.visualize:
+                logger.info("Creating visualization...")
+                visualization_path = os.path.join(
+                    VISUALIZATION_DIR,
+                    f'visualization_{os.path.basename(data["video_path"])}.png'
+                )
+                
+                self.visualizer.create_visualization(
+                    video_emotions,
+                    speech_emotions,
+                    text_results,
+                    fusion_results,
+                    visualization_path
+                )
+
+            timings['visualization'] = time.perf_counter() - stage_started
+
+            # Временная шкала видео хранится в массивах до границы API
+            if video_emotions['timeline'] is not None:
+                video_emotions['timeline'] = video_emotions['timeline'].to_records()
+            timings['total'] = time.perf_counter() - started
+
             results = {
                 'video_emotions': video_emotions,
                 'speech_emotions': speech_emotions,
                 'text_emotions': text_results,
                 'fusion_results': fusion_results,
+                'charts': charts,
                 'visualization_path': visualization_path
             }
+            if audio.segments:
+                results['voice_activity'] = audio.get_activity_stats()
+            if visualizations is not None:
+                results['visualizations'] = visualizations
+            results['timings'] = {stage: round(seconds, 3) for stage, seconds in timings.items()}
+            if errors:
+                results['errors'] = errors
 
             logger.info("Analysis completed successfully")
             return results
@@ -106,6 +256,175 @@ class EmotionAnalysisSystem:
             logger.error(f"Error during analysis: {e}")
             return None
 
+    def _run_branch(self, name, method, *args, **kwargs):
+        """
+        Ветка анализа одной модальности: ошибки не выходят за пределы ветки.
+        Модель модальности загружается внутри ветки, если еще не загружена
+        :param method: имя метода анализатора модальности name
+        :return: (результат или None, время в секундах, текст ошибки или None)
+        """
+        started = time.perf_counter()
+        try:
+            logger.info(f"Analyzing {name} emotions...")
+            result = getattr(self.models.get(name), method)(*args, **kwargs)
+            error = None if result else f"{name} analysis failed"
+        except Exception as e:
+            result, error = None, str(e)
+        return result, time.perf_counter() - started, error
+
+    def _analyze_modalities(self, data, timings, errors):
+        """
+        Анализ видео, речи и текста - последовательно или в собственных потоках сессии:
+        ветки разных сессий не ждут друг друга в общей очереди, поэтому branch_timeout
+        отсчитывается фактически от начала работы ветки.
+        С partial_results неудачная ветка (ошибка или превышение branch_timeout) не прерывает
+        остальные: модальность заменяется пустыми результатами и не участвует в объединении.
+        Без него первая же неудачная ветка завершает анализ.
+        :return: (audio, video_emotions, speech_emotions, text_results) или None,
+                 если аудио не загружено или ветки не удались
+        """
+        executor = ThreadPoolExecutor(
+            max_workers=3, thread_name_prefix='modality'
+        ) if self.concurrent else None
+        try:
+            return self._collect_modalities(data, timings, errors, executor)
+        finally:
+            if executor is not None:
+                # Завершившиеся ветки освобождают потоки сразу, зависшие - по окончании
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def _collect_modalities(self, data, timings, errors, executor):
+        branches = {}
+        results = {}
+
+        def cancel():
+            for submitted, branch in branches.values():
+                if submitted is not None:
+                    branch.cancel()
+
+        def collect(name):
+            """Результат ветки; False - анализ нужно прервать"""
+            submitted, branch = branches[name]
+            if submitted is None:
+                result, seconds, error = branch
+            else:
+                # Ограничение отсчитывается от запуска ветки; поток с зависшей моделью
+                # остановить нельзя, его результат просто не ждут
+                timeout = None
+                if self.branch_timeout is not None:
+                    timeout = max(0.0, submitted + self.branch_timeout - time.perf_counter())
+                try:
+                    result, seconds, error = branch.result(timeout=timeout)
+                except FutureTimeoutError:
+                    result, seconds = None, time.perf_counter() - submitted
+                    error = f"timed out after {self.branch_timeout} s"
+                    self._abandon(name, branch)
+
+            timings[name] = seconds
+            if error is not None:
+                logger.error(f"{name.capitalize()} analysis failed: {error}")
+                errors[name] = error
+                if not self.partial_results:
+                    return False
+                # Глубокая копия: вложенные словари не должны делиться между сессиями
+                result = copy.deepcopy(self.EMPTY_RESULTS[name])
+            results[name] = result
+            return True
+
+        if executor is not None:
+            # Видео не зависит от аудио и запускается до его декодирования
+            branches['video'] = (time.perf_counter(), executor.submit(
+                self._run_branch, 'video', 'analyze_video',
+                data['video_path'], timeline_format='array'
+            ))
+        else:
+            branches['video'] = (None, self._run_branch(
+                'video', 'analyze_video',
+                data['video_path'], timeline_format='array'
+            ))
+            if not collect('video'):
+                return None
+
+        # Аудио декодируется один раз и используется всеми аудио-анализаторами;
+        # потоковое чтение (SpeechEmotionAnalyzer(streaming=True)) здесь не применяется:
+        # детектору речи и Whisper нужна вся запись
+        stage_started = time.perf_counter()
+        audio = load_audio(data['audio_path'])
+        if audio is not None and self.vad is not None:
+            # Тишина отбрасывается один раз; оба аудио-анализатора получают только речь
+            audio = self.vad.apply(audio)
+        timings['audio_loading'] = time.perf_counter() - stage_started
+
+        if audio is None:
+            logger.error("Audio loading failed")
+            cancel()
+            return None
+
+        audio_branches = {
+            'speech': ('analyze_emotion', {'visualize': self.visualize and self.render_worker is None}),
+            'text': ('process_audio', {})
+        }
+        for name, (method, kwargs) in audio_branches.items():
+            if executor is not None:
+                branches[name] = (time.perf_counter(), executor.submit(
+                    self._run_branch, name, method, audio, **kwargs
+                ))
+            else:
+                branches[name] = (None, self._run_branch(name, method, audio, **kwargs))
+                if not collect(name):
+                    return None
+
+        for name in branches:
+            if name not in results and name not in errors and not collect(name):
+                cancel()
+                return None
+
+        if len(errors) == len(branches):
+            logger.error("All modality analyses failed")
+            return None
+        return audio, results['video'], results['speech'], results['text']
+
+    def _submit_visualizations(self, data, audio, video_emotions, speech_emotions,
+                               text_results, fusion_results) -> Dict[str, str]:
+        """
+        Сохранение данных для графиков в RenderWorker
+        :return: {имя графика: путь, по которому появится PNG}
+        """
+        session_id = self.session_id(data)
+        source = audio.original
+
+        # Графикам нужны только агрегаты, без покадровых шкал
+        fusion_summary = {
+            k: fusion_results[k] for k in ('emotions', 'dominant_emotion', 'confidence_scores')
+        } if fusion_results else {}
+        audio_payload = {'emotions': speech_emotions['average']}
+        if source.path and os.path.exists(source.path):
+            audio_payload['audio_path'] = source.path
+        else:
+            audio_payload['spectrogram'] = self.speech_analyzer.visualizer.get_spectrogram(source)
+
+        return {
+            'audio': self.render_worker.submit(session_id, 'audio', audio_payload),
+            'session': self.render_worker.submit(session_id, 'session', {
+                'video_emotions': {'average': video_emotions['average']},
+                'speech_emotions': {'average': speech_emotions['average']},
+                'text_results': {'emotions': text_results['emotions']},
+                'fusion_results': fusion_summary
+            }),
+            'fusion': self.render_worker.submit(session_id, 'fusion', {'fusion_results': fusion_summary})
+        }
+
+    @staticmethod
+    def session_id(data: Dict) -> str:
+        """Идентификатор сессии для кэша визуализаций"""
+        return data.get('session_id') or os.path.splitext(os.path.basename(data['video_path']))[0]
+
+    def close(self):
+        """Остановка процессов распознавания"""
+        text_analyzer = self.models.get_loaded('text')
+        if text_analyzer is not None:
+            text_analyzer.close()
+
     def cleanup(self):
         """Очистка временных файлов"""
         try:
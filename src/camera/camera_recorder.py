@@ -91,7 +91,8 @@ class CameraRecorder:
                 )
                 
                 if len(faces) > 0:
-                    face = faces[0]
+                    # Берем наибольшее лицо, чтобы рамка не прыгала между людьми
+                    face = max(faces, key=lambda f: f['facial_area']['w'] * f['facial_area']['h'])
                     facial_area = face['facial_area']
                     x = facial_area['x']
                     y = facial_area['y']
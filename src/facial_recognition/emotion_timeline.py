@@ -0,0 +1,152 @@
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+class EmotionTimeline:
+    """
+    Компактная временная шкала эмоций.
+
+    Хранит оценки в массиве float32 формы (кадры x эмоции) и временные метки
+    в отдельном массиве. Среднее и дисперсия считаются на лету алгоритмом
+    Уэлфорда, поэтому в режиме keep_frames=False память не зависит от длины видео.
+    """
+
+    def __init__(self, emotions, keep_frames=True, initial_capacity=256):
+        """
+        :param emotions: список названий эмоций (порядок столбцов)
+        :param keep_frames: хранить покадровые значения или только агрегаты
+        :param initial_capacity: начальный размер буферов
+        """
+        self.emotions = list(emotions)
+        self.keep_frames = keep_frames
+
+        capacity = max(1, int(initial_capacity)) if keep_frames else 0
+        self._timestamps = np.empty(capacity, dtype=np.float64)
+        self._scores = np.empty((capacity, len(self.emotions)), dtype=np.float32)
+        self._reused = np.empty(capacity, dtype=bool)
+        self._size = 0
+
+        # Агрегаты Уэлфорда
+        self.count = 0
+        self._mean = np.zeros(len(self.emotions), dtype=np.float64)
+        self._m2 = np.zeros(len(self.emotions), dtype=np.float64)
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp, scores, reused=False):
+        """
+        Добавление одного кадра
+        :param scores: оценки в порядке self.emotions (массив или словарь)
+        """
+        self.extend([timestamp], [self._as_row(scores)], [reused])
+
+    def extend(self, timestamps, scores, reused=None):
+        """Добавление пакета кадров"""
+        scores = np.asarray(scores, dtype=np.float32).reshape(-1, len(self.emotions))
+        n = len(scores)
+        if n == 0:
+            return
+
+        if self.keep_frames:
+            self._reserve(self._size + n)
+            self._timestamps[self._size:self._size + n] = timestamps
+            self._scores[self._size:self._size + n] = scores
+            self._reused[self._size:self._size + n] = False if reused is None else reused
+            self._size += n
+
+        # Объединение агрегатов пакета с накопленными (Chan et al.)
+        batch = scores.astype(np.float64)
+        batch_mean = batch.mean(axis=0)
+        batch_m2 = ((batch - batch_mean) ** 2).sum(axis=0)
+
+        total = self.count + n
+        delta = batch_mean - self._mean
+        self._mean += delta * n / total
+        self._m2 += batch_m2 + delta ** 2 * self.count * n / total
+        self.count = total
+
+    def _reserve(self, size):
+        """Геометрическое расширение буферов"""
+        capacity = len(self._timestamps)
+        if size <= capacity:
+            return
+
+        capacity = max(size, capacity * 2)
+        self._timestamps = np.resize(self._timestamps, capacity)
+        self._reused = np.resize(self._reused, capacity)
+        scores = np.empty((capacity, len(self.emotions)), dtype=np.float32)
+        scores[:self._size] = self._scores[:self._size]
+        self._scores = scores
+
+    def _as_row(self, scores):
+        """Приведение словаря эмоций к строке массива"""
+        if isinstance(scores, dict):
+            return [scores.get(emotion, 0.0) for emotion in self.emotions]
+        return scores
+
+    @property
+    def timestamps(self):
+        return self._timestamps[:self._size]
+
+    @property
+    def scores(self):
+        return self._scores[:self._size]
+
+    @property
+    def reused(self):
+        return self._reused[:self._size]
+
+    @property
+    def mean(self):
+        return self._mean.copy()
+
+    @property
+    def variance(self):
+        if self.count == 0:
+            return np.zeros(len(self.emotions))
+        return self._m2 / self.count
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    def average(self):
+        """Средние значения эмоций в формате словаря"""
+        return {emotion: float(value) for emotion, value in zip(self.emotions, self._mean)}
+
+    def deviation(self):
+        """Стандартные отклонения эмоций в формате словаря"""
+        return {emotion: float(value) for emotion, value in zip(self.emotions, self.std)}
+
+    def dominant_emotion(self):
+        """Эмоция с наибольшим средним значением"""
+        if self.count == 0:
+            return None
+        return self.emotions[int(np.argmax(self._mean))]
+
+    def to_records(self):
+        """Преобразование в список словарей {'timestamp', 'emotions'} для API"""
+        if not self.keep_frames:
+            return None
+
+        records = []
+        for timestamp, row, reused in zip(self.timestamps.tolist(), self.scores.tolist(), self.reused.tolist()):
+            record = {'timestamp': timestamp, 'emotions': dict(zip(self.emotions, row))}
+            if reused:
+                record['reused'] = True
+            records.append(record)
+        return records
+
+    @classmethod
+    def from_records(cls, records, emotions):
+        """Построение временной шкалы из списка словарей"""
+        timeline = cls(emotions, initial_capacity=max(len(records), 1))
+        if records:
+            timeline.extend(
+                [record['timestamp'] for record in records],
+                [timeline._as_row(record['emotions']) for record in records],
+                [record.get('reused', False) for record in records]
+            )
+        return timeline
@@ -0,0 +1,243 @@
+import cv2
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+def box_iou(a, b):
+    """IoU двух рамок (x, y, w, h)"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    inter_w = min(ax + aw, bx + bw) - max(ax, bx)
+    inter_h = min(ay + ah, by + bh) - max(ay, by)
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    inter = inter_w * inter_h
+    return inter / float(aw * ah + bw * bh - inter)
+
+class FaceTracker:
+    """
+    Режим detect-then-track.
+
+    Детектор запускается на уменьшенном кадре раз в detect_interval кадров
+    или когда падает уверенность трекинга. Между детекциями рамки лиц
+    переносятся оптическим потоком Лукаса-Канаде по характерным точкам
+    внутри каждой рамки.
+    """
+
+    def __init__(self, detect_fn, detect_interval=10, detect_scale=0.5,
+                 min_confidence=0.5, min_points=8, max_gap=5, max_faces=1):
+        """
+        :param detect_fn: функция детекции, принимает кадр и возвращает список рамок (x, y, w, h)
+        :param detect_interval: запускать детектор не реже чем раз в N кадров
+        :param detect_scale: масштаб кадра для детекции и трекинга
+        :param min_confidence: доля выживших точек, ниже которой выполняется повторная детекция
+        :param min_points: минимальное количество точек для трекинга одной рамки
+        :param max_gap: максимальный разрыв в номерах кадров, через который допускается трекинг
+        :param max_faces: сколько наибольших лиц отслеживать
+        """
+        self.detect_fn = detect_fn
+        self.detect_interval = max(1, int(detect_interval))
+        self.detect_scale = detect_scale
+        self.min_confidence = min_confidence
+        self.min_points = min_points
+        self.max_gap = max_gap
+        self.max_faces = max(1, int(max_faces))
+        self.reset()
+
+    def reset(self):
+        """Сброс состояния трекера"""
+        self._boxes = []
+        self._points = []
+        self._initial_points = []
+        self._prev_gray = None
+        self._last_index = None
+        self._since_detection = 0
+        self.confidence = 0.0
+        self.detections = 0
+        self.tracked = 0
+
+    def update(self, frame, index):
+        """
+        Обновление положения лиц на кадре
+        :param frame: BGR кадр в полном разрешении
+        :param index: порядковый номер кадра
+        :return: список рамок (x, y, w, h) в координатах полного кадра
+        """
+        small = self._downscale(frame)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+        gap = None if self._last_index is None else index - self._last_index
+        need_detection = (
+            not self._boxes or
+            gap is None or gap > self.max_gap or
+            self._since_detection >= self.detect_interval
+        )
+
+        if not need_detection:
+            need_detection = not self._track(gray)
+
+        if need_detection:
+            self._detect(small, gray)
+
+        self._prev_gray = gray
+        self._last_index = index
+
+        scale = 1.0 / self.detect_scale
+        return [
+            (int(round(x * scale)), int(round(y * scale)),
+             int(round(w * scale)), int(round(h * scale)))
+            for x, y, w, h in self._boxes
+        ]
+
+    def _downscale(self, frame):
+        """Уменьшение кадра для детекции и трекинга"""
+        if self.detect_scale == 1.0:
+            return frame
+        return cv2.resize(frame, None, fx=self.detect_scale, fy=self.detect_scale,
+                          interpolation=cv2.INTER_AREA)
+
+    def _detect(self, small, gray):
+        """Запуск детектора и инициализация точек трекинга"""
+        self.detections += 1
+        self._since_detection = 0
+
+        boxes = sorted(self.detect_fn(small) or [], key=lambda b: b[2] * b[3], reverse=True)
+        self._boxes = [tuple(float(v) for v in box) for box in boxes[:self.max_faces]]
+        self._points = [self._find_points(gray, box) for box in self._boxes]
+        self._initial_points = [0 if points is None else len(points) for points in self._points]
+        self.confidence = 1.0 if self._boxes else 0.0
+
+    def _track(self, gray):
+        """
+        Перенос всех рамок оптическим потоком
+        :return: False если трекинг хотя бы одной рамки ненадежен и нужна детекция
+        """
+        if self._prev_gray is None:
+            return False
+
+        boxes, all_points, confidences = [], [], []
+        for box, points, initial in zip(self._boxes, self._points, self._initial_points):
+            result = self._track_box(gray, box, points, initial)
+            if result is None:
+                return False
+            boxes.append(result[0])
+            all_points.append(result[1])
+            confidences.append(result[2])
+
+        self._boxes = boxes
+        self._points = all_points
+        self.confidence = min(confidences)
+        self._since_detection += 1
+        self.tracked += 1
+        return True
+
+    def _track_box(self, gray, box, points, initial):
+        """Перенос одной рамки; None если трекинг ненадежен"""
+        if points is None or len(points) < self.min_points:
+            return None
+
+        next_points, status, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, points, None)
+        if next_points is None:
+            return None
+
+        # Проверка вперед-назад отсеивает точки, сорвавшиеся с лица
+        back_points, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self._prev_gray, next_points, None)
+        fb_error = np.linalg.norm((points - back_points).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (back_status.ravel() == 1) & (fb_error < 1.0)
+
+        old = points.reshape(-1, 2)[good]
+        new = next_points.reshape(-1, 2)[good]
+        confidence = len(new) / max(initial, 1)
+        if len(new) < self.min_points or confidence < self.min_confidence:
+            return None
+
+        # Сдвиг - медиана смещений, масштаб - медиана отношения расстояний до центра
+        shift = np.median(new - old, axis=0)
+        old_spread = np.linalg.norm(old - old.mean(axis=0), axis=1)
+        new_spread = np.linalg.norm(new - new.mean(axis=0), axis=1)
+        valid = old_spread > 1e-3
+        scale = float(np.median(new_spread[valid] / old_spread[valid])) if valid.any() else 1.0
+
+        x, y, w, h = box
+        cx, cy = x + w / 2 + shift[0], y + h / 2 + shift[1]
+        w, h = w * scale, h * scale
+        return (cx - w / 2, cy - h / 2, w, h), new.reshape(-1, 1, 2).astype(np.float32), confidence
+
+    def _find_points(self, gray, box):
+        """Поиск характерных точек внутри рамки лица"""
+        x, y, w, h = (int(round(v)) for v in box)
+        mask = np.zeros_like(gray)
+        mask[max(y, 0):max(y + h, 0), max(x, 0):max(x + w, 0)] = 255
+        return cv2.goodFeaturesToTrack(gray, maxCorners=50, qualityLevel=0.01,
+                                       minDistance=3, mask=mask)
+
+    def get_stats(self):
+        """Статистика детекций и трекинга"""
+        return {
+            'detect_interval': self.detect_interval,
+            'detect_scale': self.detect_scale,
+            'detections': self.detections,
+            'tracked_frames': self.tracked
+        }
+
+class TrackAssigner:
+    """
+    Сопоставление лиц между кадрами по IoU рамок.
+    Каждому лицу присваивается идентификатор трека; трек закрывается,
+    если лицо не появлялось дольше max_age секунд.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_age=1.0):
+        """
+        :param iou_threshold: минимальный IoU для продолжения трека
+        :param max_age: время (сек), после которого пропавший трек закрывается
+        """
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.reset()
+
+    def reset(self):
+        """Сброс всех треков"""
+        # track_id -> {'box', 'last_seen', 'hits'}
+        self.tracks = {}
+        self._next_id = 0
+
+    def assign(self, boxes, timestamp):
+        """
+        Назначение треков рамкам одного кадра
+        :param boxes: список рамок (x, y, w, h)
+        :return: список идентификаторов треков в порядке рамок
+        """
+        active = [
+            track_id for track_id, track in self.tracks.items()
+            if timestamp - track['last_seen'] <= self.max_age
+        ]
+
+        # Жадное сопоставление по убыванию IoU
+        pairs = sorted(
+            ((box_iou(self.tracks[track_id]['box'], box), track_id, i)
+             for track_id in active for i, box in enumerate(boxes)),
+            reverse=True
+        )
+        assigned = [None] * len(boxes)
+        used = set()
+        for iou, track_id, i in pairs:
+            if iou < self.iou_threshold:
+                break
+            if assigned[i] is None and track_id not in used:
+                assigned[i] = track_id
+                used.add(track_id)
+
+        for i, box in enumerate(boxes):
+            if assigned[i] is None:
+                assigned[i] = self._next_id
+                self.tracks[self._next_id] = {'box': box, 'last_seen': timestamp, 'hits': 0}
+                self._next_id += 1
+
+            track = self.tracks[assigned[i]]
+            track['box'] = box
+            track['last_seen'] = timestamp
+            track['hits'] += 1
+
+        return assigned
@@ -5,49 +5,258 @@ import warnings
 from tqdm import tqdm
 import logging
 import os
+import sys
+import queue
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from facial_recognition.frame_sampler import FrameSampler
+from facial_recognition.face_tracker import FaceTracker, TrackAssigner
+from facial_recognition.emotion_timeline import EmotionTimeline
+from facial_recognition.video_reader import SparseVideoReader
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
 class VideoEmotionAnalyzer:
-    def __init__(self):
-        """Инициализация анализатора видео"""
+    # Размер входа CNN эмоций DeepFace
+    MODEL_INPUT_SIZE = (48, 48)
+
+    def __init__(self, batch_size=16, detector_backend='opencv',
+                 target_fps=None, diff_threshold=None,
+                 track_faces=False, detect_interval=10, detect_scale=0.5,
+                 num_workers=1, queue_size=4, multi_face=False, max_faces=5):
+        """
+        Инициализация анализатора видео
+        :param batch_size: количество лиц, классифицируемых за один вызов модели
+        :param detector_backend: детектор лиц DeepFace
+        :param target_fps: частота анализа по умолчанию (кадров в секунду), None - по sample_rate
+        :param diff_threshold: порог фильтра изменений по умолчанию, None - фильтр выключен
+        :param track_faces: режим detect-then-track вместо детекции на каждом кадре
+        :param detect_interval: в режиме трекинга детектор запускается раз в N кадров
+        :param detect_scale: масштаб кадра для детекции в режиме трекинга
+        :param num_workers: количество потоков инференса
+        :param queue_size: глубина очереди пакетов между декодером и инференсом
+        :param multi_face: анализировать все лица в кадре с треками по каждому лицу
+        :param max_faces: максимальное количество лиц в кадре в режиме multi_face
+        """
         try:
             self.emotions = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+            self.batch_size = max(1, int(batch_size))
+            self.detector_backend = detector_backend
+            self.target_fps = target_fps
+            self.diff_threshold = diff_threshold
+            self.track_faces = track_faces
+            self.detect_interval = detect_interval
+            self.detect_scale = detect_scale
+            self.num_workers = max(1, int(num_workers))
+            self.queue_size = max(1, int(queue_size))
+            self.multi_face = multi_face
+            self.max_faces = max(1, int(max_faces))
+            self._emotion_model = None
             logger.info("VideoEmotionAnalyzer initialized successfully")
         except Exception as e:
             logger.error(f"Error initializing VideoEmotionAnalyzer: {e}")
             raise
 
-    def analyze_frame(self, frame):
+    @property
+    def emotion_model(self):
+        """Модель эмоций DeepFace, загружается при первом обращении"""
+        if self._emotion_model is None:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                self._emotion_model = DeepFace.build_model('Emotion')
+        return self._emotion_model
+
+    def warmup(self):
+        """Загрузка модели эмоций и детектора лиц и пробный прогон на пустом кадре"""
+        self.extract_faces(np.zeros((240, 320, 3), dtype=np.uint8))
+        self.classify_faces([np.zeros(self.MODEL_INPUT_SIZE, dtype=np.float32)])
+
+    def extract_faces(self, frame, enforce_detection=False):
         """
-        Анализ эмоций на одном кадре
-        Returns: dict with emotion probabilities or None if no face detected
+        Детекция всех лиц на кадре и подготовка входов для модели эмоций
+        :param enforce_detection: False - при отсутствии лиц DeepFace вернет весь кадр
+        Returns: list of ((x, y, w, h), grayscale face array 48x48 in [0, 1])
         """
         try:
             with warnings.catch_warnings():
                 warnings.simplefilter("ignore")
-                
-                result = DeepFace.analyze(
+
+                faces = DeepFace.extract_faces(
                     frame,
-                    actions=['emotion'],
-                    enforce_detection=False,
-                    silent=True
+                    detector_backend=self.detector_backend,
+                    enforce_detection=enforce_detection
                 )
-                
-                if result:
-                    return result[0]['emotion']
-                return None
-                
+
+            results = []
+            for face in faces or []:
+                # DeepFace возвращает лицо в RGB, нормализованное в [0, 1]
+                gray = cv2.cvtColor(face['face'].astype(np.float32), cv2.COLOR_RGB2GRAY)
+                area = face['facial_area']
+                box = (area['x'], area['y'], area['w'], area['h'])
+                results.append((box, cv2.resize(gray, self.MODEL_INPUT_SIZE)))
+            return results
+
+        except ValueError:
+            # DeepFace сообщает об отсутствии лица исключением
+            return []
         except Exception as e:
-            logger.error(f"Error analyzing frame: {e}")
+            logger.error(f"Error extracting faces: {e}")
+            return []
+
+    def extract_face(self, frame):
+        """
+        Детекция лица на кадре и подготовка входа для модели эмоций
+        Returns: grayscale face array 48x48 in [0, 1] or None
+        """
+        faces = self.extract_faces(frame)
+        return faces[0][1] if faces else None
+
+    def detect_face_boxes(self, frame):
+        """
+        Детекция лиц без классификации
+        Returns: list of (x, y, w, h)
+        """
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+
+                faces = DeepFace.extract_faces(
+                    frame,
+                    detector_backend=self.detector_backend,
+                    enforce_detection=True,
+                    align=False
+                )
+
+            return [
+                (face['facial_area']['x'], face['facial_area']['y'],
+                 face['facial_area']['w'], face['facial_area']['h'])
+                for face in faces or []
+            ]
+
+        except ValueError:
+            return []
+        except Exception as e:
+            logger.error(f"Error detecting faces: {e}")
+            return []
+
+    def crop_face(self, frame, box):
+        """
+        Вырезание лица по рамке и подготовка входа для модели эмоций
+        Returns: grayscale face array 48x48 in [0, 1] or None
+        """
+        height, width = frame.shape[:2]
+        x, y, w, h = box
+        x1, y1 = max(x, 0), max(y, 0)
+        x2, y2 = min(x + w, width), min(y + h, height)
+        if x2 <= x1 or y2 <= y1:
             return None
 
-    def analyze_video(self, video_path, sample_rate=1):
+        face = frame[y1:y2, x1:x2]
+        if face.ndim == 3:
+            face = cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
+        face = cv2.resize(face, self.MODEL_INPUT_SIZE, interpolation=cv2.INTER_AREA)
+        return face.astype(np.float32) / 255.0
+
+    def create_tracker(self, multi_face=False):
+        """Трекер лиц для режима detect-then-track"""
+        return FaceTracker(
+            self.detect_face_boxes,
+            detect_interval=self.detect_interval,
+            detect_scale=self.detect_scale,
+            max_faces=self.max_faces if multi_face else 1
+        )
+
+    def locate_faces(self, frame, tracker=None, index=0, multi_face=False):
+        """
+        Получение входов для модели эмоций: детекцией на кадре
+        или, в режиме трекинга, вырезанием лиц по рамкам трекера
+        Returns: list of ((x, y, w, h) or None, face array)
+        """
+        if tracker is not None:
+            faces = [(box, self.crop_face(frame, box)) for box in tracker.update(frame, index)]
+            return [(box, face) for box, face in faces if face is not None]
+
+        if not multi_face:
+            # Без гарантии наличия лица DeepFace анализирует весь кадр, как DeepFace.analyze
+            faces = self.extract_faces(frame)
+            return faces[:1]
+
+        faces = self.extract_faces(frame, enforce_detection=True)
+        faces.sort(key=lambda face: face[0][2] * face[0][3], reverse=True)
+        return faces[:self.max_faces]
+
+    def classify_faces(self, faces):
+        """
+        Классификация эмоций для пакета лиц одним вызовом модели
+        :param faces: список grayscale-лиц 48x48 из extract_face
+        :return: массив N x 7 с вероятностями эмоций в процентах
+        """
+        if not faces:
+            return np.empty((0, len(self.emotions)), dtype=np.float32)
+
+        batch = np.stack(faces).astype(np.float32)[..., np.newaxis]
+        predictions = self.emotion_model.predict(batch, verbose=0)
+        predictions = np.asarray(predictions, dtype=np.float32)
+
+        # Нормализация как в DeepFace.analyze
+        totals = predictions.sum(axis=1, keepdims=True)
+        totals[totals == 0] = 1.0
+        return 100 * predictions / totals
+
+    def analyze_frames(self, frames):
+        """
+        Анализ эмоций на пакете кадров
+        Returns: list of emotion dicts (None for frames without a face)
+        """
+        try:
+            faces = [self.extract_face(frame) for frame in frames]
+            detected = [face for face in faces if face is not None]
+            scores = iter(self.classify_faces(detected))
+
+            return [
+                self._to_emotion_dict(next(scores)) if face is not None else None
+                for face in faces
+            ]
+
+        except Exception as e:
+            logger.error(f"Error analyzing frames: {e}")
+            return [None] * len(frames)
+
+    def analyze_frame(self, frame):
+        """
+        Анализ эмоций на одном кадре
+        Returns: dict with emotion probabilities or None if no face detected
+        """
+        return self.analyze_frames([frame])[0]
+
+    def _to_emotion_dict(self, scores):
+        """Преобразование строки вероятностей в словарь эмоций"""
+        return {emotion: float(score) for emotion, score in zip(self.emotions, scores)}
+
+    def analyze_video(self, video_path, sample_rate=1, batch_size=None,
+                      target_fps=None, diff_threshold=None, track_faces=None,
+                      num_workers=None, queue_size=None, timeline_format='records',
+                      seek=True, multi_face=None):
         """
         Анализ эмоций в видео файле
         :param video_path: Path to video file
-        :param sample_rate: Analyze every Nth frame
+        :param sample_rate: Analyze every Nth frame (ignored when target_fps is set)
+        :param batch_size: Faces per model call (defaults to self.batch_size)
+        :param target_fps: Analysis rate in frames per second (defaults to self.target_fps)
+        :param diff_threshold: Reuse threshold for the frame-difference gate
+                               (defaults to self.diff_threshold)
+        :param track_faces: Use detect-then-track face localization (defaults to self.track_faces)
+        :param num_workers: Inference worker threads (defaults to self.num_workers)
+        :param queue_size: Max batches buffered between decoder and workers
+                           (defaults to self.queue_size)
+        :param timeline_format: 'records' - list of {'timestamp', 'emotions'} dicts,
+                                'array' - EmotionTimeline with NumPy arrays,
+                                'none' - aggregates only, O(1) memory
+        :param seek: Allow timestamp seeking over long gaps when the container supports it
+        :param multi_face: Analyze every face and keep per-face tracks (defaults to self.multi_face)
         :return: Dict with analysis results
         """
         try:
@@ -58,53 +267,103 @@ class VideoEmotionAnalyzer:
                 logger.error("Could not open video file")
                 return None
 
-            frame_count = 0
-            emotions_timeline = []
-            
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            fps = int(cap.get(cv2.CAP_PROP_FPS))
-            
-            logger.info(f"Video info: {total_frames} frames, {fps} FPS")
+            if track_faces is None:
+                track_faces = self.track_faces
+            if multi_face is None:
+                multi_face = self.multi_face
+            num_workers = max(1, int(num_workers or self.num_workers))
+            sampler = FrameSampler(
+                sample_rate=sample_rate,
+                target_fps=target_fps or self.target_fps,
+                diff_threshold=diff_threshold if diff_threshold is not None else self.diff_threshold
+            )
+
+            reader = SparseVideoReader(cap, seek=seek)
+            total_frames = reader.total_frames
+            fps = reader.fps
+
+            # Общее состояние конвейера декодер -> очередь -> воркеры
+            pipeline = {
+                'queue': queue.Queue(maxsize=max(1, int(queue_size or self.queue_size))),
+                'stop': threading.Event(),
+                'lock': threading.Lock(),
+                'batch_size': max(1, int(batch_size or self.batch_size)),
+                'num_workers': num_workers,
+                'total_frames': total_frames,
+                'track_faces': track_faces,
+                'multi_face': multi_face,
+                'keep_frames': timeline_format != 'none',
+                'chunks': {},
+                'next_seq': 0,
+                'last_faces': [],
+                'timeline': EmotionTimeline(self.emotions, keep_frames=timeline_format != 'none'),
+                'assigner': TrackAssigner(),
+                'tracks': {},
+                'frames': 0,
+                'error': None,
+                'tracking': {'detections': 0, 'tracked_frames': 0},
+                'timings': {'decode': 0.0, 'detect': 0.0, 'classify': 0.0}
+            }
             
-            with tqdm(total=total_frames, desc="Analyzing frames") as pbar:
-                while cap.isOpened():
-                    ret, frame = cap.read()
-                    if not ret:
-                        break
+            logger.info(
+                f"Video info: {total_frames} frames, {fps:.2f} FPS, "
+                f"batch size {pipeline['batch_size']}, {num_workers} worker(s)"
+            )
+
+            start_time = time.perf_counter()
+            threads = [threading.Thread(
+                target=self._decode_frames, args=(reader, sampler, pipeline), daemon=True
+            )]
+            threads += [
+                threading.Thread(target=self._inference_worker, args=(pipeline,), daemon=True)
+                for _ in range(num_workers)
+            ]
 
-                    if frame_count % sample_rate == 0:
-                        emotions = self.analyze_frame(frame)
-                        if emotions:
-                            timestamp = frame_count / fps
-                            emotions_timeline.append({
-                                'timestamp': timestamp,
-                                'emotions': emotions
-                            })
+            try:
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            finally:
+                pipeline['stop'].set()
+                cap.release()
 
-                    frame_count += 1
-                    pbar.update(1)
+            if pipeline['error'] is not None:
+                raise pipeline['error']
 
-            cap.release()
+            emotions_timeline = pipeline['timeline']
+            frame_count = pipeline['frames']
+
+            timings = {name: round(value, 3) for name, value in pipeline['timings'].items()}
+            timings['total'] = round(time.perf_counter() - start_time, 3)
+            sampling_stats = sampler.get_stats()
+            logger.info(f"Sampling: {sampling_stats}")
+            logger.info(f"Stage timings (s): {timings}")
             
-            if emotions_timeline:
-                # Вычисляем средние значения эмоций
-                avg_emotions = {emotion: 0 for emotion in self.emotions}
-                for entry in emotions_timeline:
-                    for emotion, value in entry['emotions'].items():
-                        avg_emotions[emotion] += value
-                
-                for emotion in avg_emotions:
-                    avg_emotions[emotion] /= len(emotions_timeline)
-                
-                dominant_emotion = max(avg_emotions.items(), key=lambda x: x[1])[0]
-                
+            if len(emotions_timeline):
+                # Средние значения накоплены потоково в EmotionTimeline
+                avg_emotions = emotions_timeline.average()
+                dominant_emotion = emotions_timeline.dominant_emotion()
+
                 results = {
-                    'timeline': emotions_timeline,
+                    'timeline': self._format_timeline(emotions_timeline, timeline_format),
                     'average': avg_emotions,
+                    'std': emotions_timeline.deviation(),
                     'dominant_emotion': dominant_emotion,
                     'frames_processed': frame_count,
-                    'frames_with_emotions': len(emotions_timeline)
+                    'frames_with_emotions': len(emotions_timeline),
+                    'sampling': sampling_stats,
+                    'decoding': reader.get_stats(),
+                    'timings': timings
                 }
+                if multi_face:
+                    results['tracks'] = self._summarize_tracks(pipeline['tracks'], timeline_format)
+                if track_faces:
+                    results['tracking'] = dict(
+                        pipeline['tracking'],
+                        detect_interval=self.detect_interval,
+                        detect_scale=self.detect_scale
+                    )
                 
                 logger.info(f"Analysis completed. Dominant emotion: {dominant_emotion}")
                 return results
@@ -116,6 +375,241 @@ class VideoEmotionAnalyzer:
             logger.error(f"Error during video analysis: {e}")
             return None
 
+    def _decode_frames(self, reader, sampler, pipeline):
+        """
+        Стадия декодирования: чтение выбранных кадров и группировка в пакеты.
+        Выполняется в отдельном потоке и заполняет ограниченную очередь.
+        В режиме трекинга здесь же работает единственный трекер: кадры идут
+        по порядку, и детекций столько же, сколько при одном воркере.
+        """
+        chunk = []
+        chunk_frames = 0
+        seq = 0
+        sampled_count = 0
+        tracker = self.create_tracker(pipeline['multi_face']) if pipeline['track_faces'] else None
+
+        try:
+            total = pipeline['total_frames'] if pipeline['total_frames'] > 0 else None
+            with tqdm(total=total, desc="Analyzing frames") as pbar:
+                progress = lambda index: pbar.update(index + 1 - pbar.n)
+                frames = reader.read(sampler, pipeline['stop'], progress)
+
+                while True:
+                    stage_start = time.perf_counter()
+                    item = next(frames, None)
+                    if item is None:
+                        break
+
+                    _, timestamp, frame = item
+                    faces = None
+                    # Для переиспользуемых кадров пиксели не нужны
+                    if sampler.is_similar(frame, timestamp):
+                        frame = None
+                    else:
+                        chunk_frames += 1
+                    pipeline['timings']['decode'] += time.perf_counter() - stage_start
+
+                    if tracker is not None and frame is not None:
+                        detect_start = time.perf_counter()
+                        faces = self.locate_faces(frame, tracker, sampled_count, pipeline['multi_face'])
+                        with pipeline['lock']:
+                            pipeline['timings']['detect'] += time.perf_counter() - detect_start
+                    chunk.append((sampled_count, timestamp, frame, faces))
+                    sampled_count += 1
+
+                    if chunk_frames >= pipeline['batch_size']:
+                        self._put(pipeline, (seq, chunk))
+                        chunk, chunk_frames = [], 0
+                        seq += 1
+
+            if chunk:
+                self._put(pipeline, (seq, chunk))
+
+        except Exception as e:
+            logger.error(f"Error decoding video: {e}")
+            pipeline['error'] = e
+
+        finally:
+            pipeline['frames'] = reader.frame_count
+            if tracker is not None:
+                pipeline['tracking']['detections'] = tracker.detections
+                pipeline['tracking']['tracked_frames'] = tracker.tracked
+            # Сигнал завершения для каждого воркера
+            for _ in range(pipeline['num_workers']):
+                self._put(pipeline, None)
+
+    def _put(self, pipeline, item):
+        """Помещение в очередь без вечной блокировки при остановке конвейера"""
+        while not pipeline['stop'].is_set():
+            try:
+                pipeline['queue'].put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _inference_worker(self, pipeline):
+        """
+        Стадия инференса: локализация лиц (если их не нашел трекер декодера)
+        и пакетная классификация. Ошибка сборки timeline останавливает конвейер,
+        иначе декодер навсегда заблокируется на заполненной очереди.
+        """
+        while not pipeline['stop'].is_set():
+            try:
+                item = pipeline['queue'].get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is None:
+                break
+
+            seq, chunk = item
+            try:
+                entries, detect_time, classify_time = self._process_chunk(
+                    chunk, pipeline['multi_face']
+                )
+            except Exception as e:
+                logger.error(f"Error processing batch {seq}: {e}")
+                entries, detect_time, classify_time = [], 0.0, 0.0
+
+            try:
+                with pipeline['lock']:
+                    pipeline['chunks'][seq] = entries
+                    pipeline['timings']['detect'] += detect_time
+                    pipeline['timings']['classify'] += classify_time
+                    self._drain_chunks(pipeline)
+            except Exception as e:
+                logger.error(f"Error assembling timeline at batch {seq}: {e}")
+                pipeline['error'] = e
+                pipeline['stop'].set()
+                break
+
+    def _process_chunk(self, chunk, multi_face=False):
+        """
+        Обработка пакета кадров: все лица всех кадров классифицируются одним вызовом модели
+        :param chunk: список (index, timestamp, frame, faces), frame=None для переиспользуемых
+                      кадров, faces - лица, уже найденные трекером декодера, или None
+        :return: (список (timestamp, [(box, scores), ...], reused),
+                  время детекции, время классификации)
+        """
+        detect_start = time.perf_counter()
+        located = [
+            None if frame is None else
+            faces if faces is not None else
+            self.locate_faces(frame, None, index, multi_face)
+            for index, _, frame, faces in chunk
+        ]
+
+        classify_start = time.perf_counter()
+        try:
+            inputs = [face for faces in located if faces for _, face in faces]
+            scores = iter(self.classify_faces(inputs))
+        except Exception as e:
+            logger.error(f"Error classifying batch of {len(chunk)} frames: {e}")
+            scores = None
+        classify_end = time.perf_counter()
+
+        entries = []
+        for (_, timestamp, frame, _), faces in zip(chunk, located):
+            if frame is None:
+                entries.append((timestamp, None, True))
+            elif scores is None:
+                entries.append((timestamp, [], False))
+            else:
+                entries.append((timestamp, [(box, next(scores)) for box, _ in faces], False))
+
+        return entries, classify_start - detect_start, classify_end - classify_start
+
+    def _drain_chunks(self, pipeline):
+        """
+        Потоковая сборка timeline: готовые пакеты добавляются строго по порядку
+        и сразу освобождаются. Переиспользуемые кадры получают оценки
+        последнего проанализированного кадра. Вызывается под pipeline['lock'].
+        """
+        chunks = pipeline['chunks']
+
+        while pipeline['next_seq'] in chunks:
+            timestamps, rows, reused_flags = [], [], []
+            last_faces = pipeline['last_faces']
+
+            for timestamp, faces, reused in chunks.pop(pipeline['next_seq']):
+                if not reused:
+                    last_faces = self._assign_tracks(pipeline, faces, timestamp)
+                if not last_faces:
+                    continue
+
+                timestamps.append(timestamp)
+                rows.append(self._primary_face(pipeline, last_faces))
+                reused_flags.append(reused)
+
+                if pipeline['multi_face']:
+                    self._append_to_tracks(pipeline, last_faces, timestamp, reused)
+
+            pipeline['timeline'].extend(timestamps, rows, reused_flags)
+            pipeline['last_faces'] = last_faces
+            pipeline['next_seq'] += 1
+
+    def _assign_tracks(self, pipeline, faces, timestamp):
+        """
+        Назначение лицам кадра идентификаторов треков
+        Returns: list of (track_id, scores); track_id=None вне режима multi_face
+        """
+        if not faces:
+            return []
+        if not pipeline['multi_face']:
+            return [(None, faces[0][1])]
+
+        track_ids = pipeline['assigner'].assign([box for box, _ in faces], timestamp)
+        return [(track_id, scores) for track_id, (_, scores) in zip(track_ids, faces)]
+
+    def _primary_face(self, pipeline, faces):
+        """
+        Оценки основного лица кадра: лицо из самого устойчивого трека,
+        чтобы основное лицо не переключалось между кадрами
+        """
+        if not pipeline['multi_face'] or len(faces) == 1:
+            return faces[0][1]
+
+        tracks = pipeline['assigner'].tracks
+        return max(faces, key=lambda face: tracks[face[0]]['hits'])[1]
+
+    def _append_to_tracks(self, pipeline, faces, timestamp, reused):
+        """Добавление оценок лиц в временные шкалы их треков"""
+        for track_id, scores in faces:
+            track = pipeline['tracks'].get(track_id)
+            if track is None:
+                track = pipeline['tracks'][track_id] = {
+                    'timeline': EmotionTimeline(self.emotions, keep_frames=pipeline['keep_frames'],
+                                                initial_capacity=64),
+                    'first_seen': timestamp,
+                    'last_seen': timestamp
+                }
+            track['timeline'].append(timestamp, scores, reused)
+            track['last_seen'] = timestamp
+
+    def _format_timeline(self, timeline, timeline_format):
+        """Представление временной шкалы в результатах"""
+        if timeline_format == 'records':
+            return timeline.to_records()
+        if timeline_format == 'array':
+            return timeline
+        return None
+
+    def _summarize_tracks(self, tracks, timeline_format):
+        """Результаты по каждому треку лица, от самого длинного к самому короткому"""
+        summary = [
+            {
+                'track_id': track_id,
+                'timeline': self._format_timeline(track['timeline'], timeline_format),
+                'average': track['timeline'].average(),
+                'std': track['timeline'].deviation(),
+                'dominant_emotion': track['timeline'].dominant_emotion(),
+                'frames': len(track['timeline']),
+                'first_seen': track['first_seen'],
+                'last_seen': track['last_seen']
+            }
+            for track_id, track in tracks.items()
+        ]
+        return sorted(summary, key=lambda track: track['frames'], reverse=True)
+
     def format_emotion_dict(self, emotions_dict, dominant_emotion=None):
         """Format emotions dictionary for pretty printing"""
         try:
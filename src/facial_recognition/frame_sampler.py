@@ -0,0 +1,112 @@
+import cv2
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+class FrameSampler:
+    """
+    Политика выборки кадров для анализа видео.
+
+    Кадр проходит два фильтра:
+    1. частотный — не чаще target_fps кадров в секунду (или каждый sample_rate-й кадр);
+    2. фильтр изменений — если уменьшенный grayscale-кадр почти не отличается
+       от последнего проанализированного, эмоции этого кадра переиспользуются.
+    """
+
+    def __init__(self, sample_rate=1, target_fps=None, diff_threshold=None,
+                 diff_size=(32, 32), max_reuse_interval=2.0):
+        """
+        :param sample_rate: анализировать каждый N-й кадр (если target_fps не задан)
+        :param target_fps: целевая частота анализа в кадрах в секунду
+        :param diff_threshold: порог средней абсолютной разницы (0..1) для переиспользования
+        :param diff_size: размер уменьшенного кадра для сравнения
+        :param max_reuse_interval: максимальное время (сек) переиспользования одного результата
+        """
+        self.sample_rate = max(1, int(sample_rate))
+        self.target_fps = target_fps
+        self.diff_threshold = diff_threshold
+        self.diff_size = tuple(diff_size)
+        self.max_reuse_interval = max_reuse_interval
+        self.reset()
+
+    def reset(self):
+        """Сброс состояния перед новым видео"""
+        self._next_timestamp = None
+        self._reference = None
+        self._reference_timestamp = None
+        self.frames_skipped = 0
+        self.frames_reused = 0
+        self.frames_analyzed = 0
+
+    def should_sample(self, frame_index, timestamp):
+        """
+        Частотный фильтр; вызывается до декодирования кадра
+        :return: True если кадр нужно рассмотреть
+        """
+        if self.target_fps:
+            interval = 1.0 / self.target_fps
+            if self._next_timestamp is None:
+                self._next_timestamp = timestamp
+
+            # Небольшой допуск на погрешность временных меток контейнера
+            if timestamp + 1e-3 < self._next_timestamp:
+                self.frames_skipped += 1
+                return False
+
+            while self._next_timestamp <= timestamp + 1e-3:
+                self._next_timestamp += interval
+            return True
+
+        if frame_index % self.sample_rate != 0:
+            self.frames_skipped += 1
+            return False
+        return True
+
+    @property
+    def next_timestamp(self):
+        """Ближайшая временная метка, которая пройдет частотный фильтр (только для target_fps)"""
+        if not self.target_fps:
+            return None
+        return self._next_timestamp
+
+    def is_similar(self, frame, timestamp):
+        """
+        Фильтр изменений; сравнивает кадр с последним проанализированным
+        :return: True если можно переиспользовать эмоции предыдущего кадра
+        """
+        if self.diff_threshold is None:
+            self.frames_analyzed += 1
+            return False
+
+        small = self._downscale(frame)
+        if self._reference is not None:
+            delta = float(np.mean(np.abs(small - self._reference))) / 255.0
+            expired = (self.max_reuse_interval is not None and
+                       timestamp - self._reference_timestamp > self.max_reuse_interval)
+            if delta < self.diff_threshold and not expired:
+                self.frames_reused += 1
+                return True
+
+        self._reference = small
+        self._reference_timestamp = timestamp
+        self.frames_analyzed += 1
+        return False
+
+    def _downscale(self, frame):
+        """Уменьшенный grayscale-кадр для дешевого сравнения"""
+        if frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(frame, self.diff_size, interpolation=cv2.INTER_AREA)
+        return small.astype(np.float32)
+
+    def get_stats(self):
+        """Статистика выборки для результатов анализа"""
+        return {
+            'sample_rate': self.sample_rate,
+            'target_fps': self.target_fps,
+            'diff_threshold': self.diff_threshold,
+            'frames_analyzed': self.frames_analyzed,
+            'frames_skipped': self.frames_skipped,
+            'frames_reused': self.frames_reused
+        }
@@ -0,0 +1,104 @@
+import cv2
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SparseVideoReader:
+    """
+    Чтение только тех кадров, которые нужны для анализа.
+
+    Все кадры проходят через grab(), но retrieve() (преобразование цвета и
+    копирование) выполняется только для выбранных. При больших пропусках и
+    поддержке контейнером выполняется перемотка по времени. Временные метки
+    берутся из времени показа кадра (CAP_PROP_POS_MSEC), что корректно для
+    webm с переменной частотой кадров.
+    """
+
+    def __init__(self, cap, seek=True, seek_threshold=2.0):
+        """
+        :param cap: открытый cv2.VideoCapture
+        :param seek: разрешить перемотку, если контейнер ее поддерживает
+        :param seek_threshold: минимальный пропуск (сек), при котором выполняется перемотка
+        """
+        self.cap = cap
+        self.seek_threshold = seek_threshold
+
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        # Для webm из браузера количество кадров и длительность обычно неизвестны
+        self.seekable = seek and self.total_frames > 0
+
+        self.frames_grabbed = 0
+        self.frames_decoded = 0
+        self.seeks = 0
+        self.container_timestamps = 0
+        self.frame_count = 0
+
+    def read(self, sampler, stop_event=None, on_progress=None):
+        """
+        Генератор выбранных кадров
+        :param sampler: FrameSampler, решающий какие кадры нужны
+        :param stop_event: threading.Event для досрочной остановки
+        :param on_progress: callback(frame_index) после каждого кадра
+        :return: (frame_index, timestamp, frame) только для выбранных кадров
+        """
+        index = -1
+        last_timestamp = None
+
+        while stop_event is None or not stop_event.is_set():
+            if not self.cap.grab():
+                break
+            self.frames_grabbed += 1
+
+            timestamp, index = self._position(index, last_timestamp)
+            last_timestamp = timestamp
+            self.frame_count = index + 1
+            if on_progress is not None:
+                on_progress(index)
+
+            if sampler.should_sample(index, timestamp):
+                ret, frame = self.cap.retrieve()
+                if not ret:
+                    break
+                self.frames_decoded += 1
+                yield index, timestamp, frame
+
+            self._maybe_seek(sampler, timestamp)
+
+    def _position(self, prev_index, prev_timestamp):
+        """Временная метка и номер только что захваченного кадра"""
+        index = prev_index + 1
+        position = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+
+        # Метка контейнера должна расти; иначе вычисляем по номеру кадра
+        if position > 0 or index == 0:
+            if prev_timestamp is None or position > prev_timestamp:
+                if self.seeks:
+                    index = max(index, int(round(position * self.fps)))
+                self.container_timestamps += 1
+                return position, index
+
+        return index / self.fps, index
+
+    def _maybe_seek(self, sampler, timestamp):
+        """Перемотка к следующему нужному моменту при большом пропуске"""
+        target = sampler.next_timestamp
+        if not self.seekable or target is None or target - timestamp < self.seek_threshold:
+            return
+
+        # Чуть раньше цели, чтобы не пропустить кадр с нужной меткой
+        position = max(target - 0.5 / self.fps, 0.0)
+        if self.cap.set(cv2.CAP_PROP_POS_MSEC, position * 1000.0):
+            self.seeks += 1
+        else:
+            logger.info("Container does not support seeking, falling back to grab()")
+            self.seekable = False
+
+    def get_stats(self):
+        """Статистика декодирования"""
+        return {
+            'frames_grabbed': self.frames_grabbed,
+            'frames_decoded': self.frames_decoded,
+            'seeks': self.seeks,
+            'container_timestamps': self.container_timestamps
+        }
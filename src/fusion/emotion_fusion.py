@@ -1,16 +1,23 @@
 import numpy as np
-import matplotlib.pyplot as plt
 import logging
 import os
+import sys
 from typing import Dict, Optional
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from visualizer.templates import FusionTemplate, DEFAULT_DPI, get_template
+
 logger = logging.getLogger(__name__)
 
 class EmotionFusion:
-    def __init__(self, weights: Dict[str, float] = None):
+    # Порядок модальностей во второй оси пакетного массива
+    MODALITIES = ('video', 'audio', 'text')
+
+    def __init__(self, weights: Dict[str, float] = None, dpi: int = DEFAULT_DPI):
         """
         Инициализация с настройкой весов для каждой модальности
         :param weights: {'video': float, 'audio': float, 'text': float}
+        :param dpi: разрешение сохраняемой визуализации
         """
         try:
             # Веса по умолчанию
@@ -26,7 +33,7 @@ class EmotionFusion:
                 self.weights = {k: v/total_weight for k, v in self.weights.items()}
             
             self.emotions = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
-            plt.style.use('dark_background')  # Используем темную тему для графиков
+            self.dpi = dpi
             
             logger.info("EmotionFusion initialized with weights: %s", self.weights)
             
@@ -34,37 +41,73 @@ class EmotionFusion:
             logger.error(f"Error initializing EmotionFusion: {e}")
             raise
 
+    @property
+    def weight_vector(self) -> np.ndarray:
+        """Веса модальностей в порядке MODALITIES"""
+        return np.array([self.weights.get(m, 0.0) for m in self.MODALITIES], dtype=np.float64)
+
+    def to_array(self,
+                 video_emotions: Optional[Dict[str, float]],
+                 audio_emotions: Optional[Dict[str, float]],
+                 text_emotions: Optional[Dict[str, float]]):
+        """
+        Словари эмоций одной сессии -> массив 3 x 7 и маска наличия модальностей
+        """
+        modalities = (video_emotions, audio_emotions, text_emotions)
+        scores = np.array(
+            [[(emotions or {}).get(e, 0.0) for e in self.emotions] for emotions in modalities],
+            dtype=np.float64
+        )
+        mask = np.array([bool(emotions) for emotions in modalities])
+        return scores, mask
+
+    def fuse_batch(self, scores: np.ndarray, mask: Optional[np.ndarray] = None,
+                   renormalize: bool = False) -> Dict:
+        """
+        Пакетное объединение эмоций для N сессий
+        :param scores: массив N x 3 x 7 (сессии x модальности в порядке MODALITIES x эмоции)
+        :param mask: булев массив N x 3 - наличие модальности; None - все модальности есть
+        :param renormalize: делить на сумму весов присутствующих модальностей
+        :return: {'emotions': N x 7, 'dominant': N индексов в self.emotions,
+                  'dominant_emotion': N названий, 'confidence': N x 3 уверенности модальностей (%)}
+        """
+        scores = np.asarray(scores, dtype=np.float64)
+        if mask is None:
+            mask = np.ones(scores.shape[:2], dtype=bool)
+        mask = np.asarray(mask, dtype=bool)
+
+        # Отсутствующая модальность ничего не добавляет
+        weights = self.weight_vector * mask
+        if renormalize:
+            total = weights.sum(axis=1, keepdims=True)
+            weights = np.divide(weights, total, out=np.zeros_like(weights), where=total > 0)
+        fused = np.einsum('nm,nme->ne', weights, scores)
+        dominant = np.argmax(fused, axis=1)
+
+        return {
+            'emotions': fused,
+            'dominant': dominant,
+            'dominant_emotion': np.array(self.emotions)[dominant],
+            'confidence': self._calculate_confidence_batch(scores, mask)
+        }
+
     def fuse_emotions(self, 
                      video_emotions: Dict[str, float],
                      audio_emotions: Dict[str, float],
                      text_emotions: Dict[str, float]) -> Dict:
         """
         Объединение эмоций из разных модальностей с учетом весов
+        (одна сессия через fuse_batch)
         """
         try:
             logger.info("Starting emotion fusion")
             
-            # Инициализация результирующих эмоций
-            fused_emotions = {emotion: 0.0 for emotion in self.emotions}
-            
-            # Объединяем эмоции с учетом весов
-            for emotion in self.emotions:
-                if video_emotions:
-                    fused_emotions[emotion] += video_emotions.get(emotion, 0.0) * self.weights['video']
-                if audio_emotions:
-                    fused_emotions[emotion] += audio_emotions.get(emotion, 0.0) * self.weights['audio']
-                if text_emotions:
-                    fused_emotions[emotion] += text_emotions.get(emotion, 0.0) * self.weights['text']
+            scores, mask = self.to_array(video_emotions, audio_emotions, text_emotions)
+            batch = self.fuse_batch(scores[np.newaxis], mask[np.newaxis])
             
-            # Определяем доминирующую эмоцию
-            dominant_emotion = max(fused_emotions.items(), key=lambda x: x[1])[0]
-            
-            # Рассчитываем уверенность для каждой модальности
-            confidence_scores = {
-                'video': self._calculate_confidence(video_emotions),
-                'audio': self._calculate_confidence(audio_emotions),
-                'text': self._calculate_confidence(text_emotions)
-            }
+            fused_emotions = dict(zip(self.emotions, batch['emotions'][0].tolist()))
+            dominant_emotion = self.emotions[int(batch['dominant'][0])]
+            confidence_scores = dict(zip(self.MODALITIES, batch['confidence'][0].tolist()))
             
             logger.info(f"Fusion completed. Dominant emotion: {dominant_emotion}")
             
@@ -78,32 +121,175 @@ class EmotionFusion:
             logger.error(f"Error during emotion fusion: {e}")
             return None
 
+    def _timeline_arrays(self, timeline):
+        """
+        Временная шкала -> (timestamps, scores T x 7, starts, ends)
+        :param timeline: EmotionTimeline (видео) или список записей {'timestamp', 'emotions'}
+                         с необязательными 'start'/'end' (окна речи, сегменты текста)
+        :return: None для пустой шкалы; starts/ends - None для точечных отсчетов
+        """
+        if timeline is None:
+            return None
+
+        if hasattr(timeline, 'timestamps'):
+            if not timeline.keep_frames or len(timeline.timestamps) == 0:
+                return None
+            column = [timeline.emotions.index(e) for e in self.emotions]
+            times = np.asarray(timeline.timestamps, dtype=np.float64)
+            scores = np.asarray(timeline.scores, dtype=np.float64)[:, column]
+            starts = ends = None
+        else:
+            if not timeline:
+                return None
+            times = np.array([record['timestamp'] for record in timeline], dtype=np.float64)
+            scores = np.array(
+                [[record['emotions'].get(e, 0.0) for e in self.emotions] for record in timeline],
+                dtype=np.float64
+            )
+            starts = ends = None
+            if 'start' in timeline[0] and 'end' in timeline[0]:
+                starts = np.array([record['start'] for record in timeline], dtype=np.float64)
+                ends = np.array([record['end'] for record in timeline], dtype=np.float64)
+
+        order = np.argsort(times, kind='stable')
+        if starts is not None:
+            starts, ends = starts[order], ends[order]
+        return times[order], scores[order], starts, ends
+
+    def _resample(self, data, edges, max_gap):
+        """
+        Перенос шкалы на сетку без циклов по отсчетам
+        Ячейка с отсчетами - среднее по ним; пустая ячейка - линейная интерполяция
+        между соседними отсчетами (np.searchsorted).
+        :param edges: границы ячеек сетки (T + 1)
+        :param max_gap: для точечных отсчетов - максимальное расстояние до ближайшего отсчета
+        :return: (значения T x 7, маска наличия T)
+        """
+        times, scores, starts, ends = data
+        centers = (edges[:-1] + edges[1:]) / 2
+
+        # Средние по ячейкам через накопленные суммы
+        cumulative = np.vstack((np.zeros((1, scores.shape[1])), np.cumsum(scores, axis=0)))
+        bounds = np.searchsorted(times, edges, side='left')
+        counts = np.diff(bounds)
+        sums = cumulative[bounds[1:]] - cumulative[bounds[:-1]]
+
+        # Линейная интерполяция в центрах ячеек
+        right = np.clip(np.searchsorted(times, centers, side='right'), 1, len(times) - 1) \
+            if len(times) > 1 else np.zeros(len(centers), dtype=int)
+        left = np.maximum(right - 1, 0)
+        span = times[right] - times[left]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fraction = np.where(span > 0, (centers - times[left]) / span, 0.0)
+        fraction = np.clip(fraction, 0.0, 1.0)[:, np.newaxis]
+        interpolated = scores[left] * (1 - fraction) + scores[right] * fraction
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = np.where(counts[:, np.newaxis] > 0, sums / np.maximum(counts, 1)[:, np.newaxis],
+                              interpolated)
+
+        if starts is not None:
+            # Интервальные данные есть там, где центр ячейки покрыт хотя бы одним интервалом
+            interval_order = np.argsort(starts, kind='stable')
+            sorted_starts = starts[interval_order]
+            reach = np.maximum.accumulate(ends[interval_order])
+            index = np.searchsorted(sorted_starts, centers, side='right') - 1
+            present = (index >= 0) & (centers < reach[np.maximum(index, 0)])
+        else:
+            # Точечные данные: есть отсчеты в ячейке или ближайший отсчет не дальше max_gap
+            nearest = np.minimum(np.abs(centers - times[left]), np.abs(times[right] - centers))
+            present = (counts > 0) | (nearest <= max_gap)
+
+        return values, present
+
+    def fuse_temporal(self, video_timeline=None, audio_timeline=None, text_timeline=None,
+                      step: float = 1.0, duration: Optional[float] = None, max_gap: float = 2.0) -> Optional[Dict]:
+        """
+        Временное объединение модальностей на общей сетке с шагом step
+        :param video_timeline: EmotionTimeline или записи {'timestamp', 'emotions'} по кадрам
+        :param audio_timeline: окна речи {'timestamp', 'start', 'end', 'emotions'}
+        :param text_timeline: сегменты текста {'timestamp', 'start', 'end', 'emotions'}
+        :param duration: длина сетки в секундах (по умолчанию - до последнего отсчета)
+        :param max_gap: разрыв между кадрами видео (сек), дольше которого видео считается отсутствующим
+        :return: {'timestamps': T, 'emotions': T x 7, 'dominant_emotion': T,
+                  'confidence': T x 3, 'presence': T x 3, 'scores': T x 3 x 7 - модальности
+                  на сетке} или None, если данных нет. На шагах без модальностей
+                  emotions - NaN, dominant_emotion - None
+        """
+        modalities = [self._timeline_arrays(t) for t in (video_timeline, audio_timeline, text_timeline)]
+        available = [data for data in modalities if data is not None]
+        if not available:
+            return None
+
+        if duration is None:
+            duration = max(data[3][-1] if data[3] is not None else data[0][-1] for data in available)
+        steps = max(1, int(np.ceil(duration / step)))
+        edges = np.arange(steps + 1, dtype=np.float64) * step
+
+        scores = np.zeros((steps, len(self.MODALITIES), len(self.emotions)))
+        mask = np.zeros((steps, len(self.MODALITIES)), dtype=bool)
+        for i, data in enumerate(modalities):
+            if data is not None:
+                scores[:, i], mask[:, i] = self._resample(data, edges, max_gap)
+
+        # На шагах без части модальностей веса перенормируются, чтобы кривая не проседала
+        fused = self.fuse_batch(scores, mask, renormalize=True)
+        # Шаг без данных: нули дали бы argmax = 0 и ложную доминирующую эмоцию 'angry'
+        present = mask.any(axis=1)
+        emotions = np.where(present[:, np.newaxis], fused['emotions'], np.nan)
+        dominant = np.where(present, fused['dominant_emotion'].astype(object), None)
+        return {
+            'timestamps': (edges[:-1] + edges[1:]) / 2,
+            'emotions': emotions,
+            'dominant_emotion': dominant,
+            'confidence': fused['confidence'],
+            'presence': mask,
+            'scores': scores
+        }
+
+    def temporal_records(self, temporal: Optional[Dict]) -> Optional[list]:
+        """Результат fuse_temporal -> список словарей для API"""
+        if temporal is None:
+            return None
+        return [
+            {
+                'timestamp': timestamp,
+                'emotions': dict(zip(self.emotions, row)) if dominant is not None else None,
+                'dominant_emotion': dominant,
+                'modalities': [m for m, present in zip(self.MODALITIES, presence) if present]
+            }
+            for timestamp, row, dominant, presence in zip(
+                temporal['timestamps'].tolist(),
+                temporal['emotions'].tolist(),
+                temporal['dominant_emotion'].tolist(),
+                temporal['presence'].tolist()
+            )
+        ]
+
+    def _calculate_confidence_batch(self, scores: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        """
+        Уверенность модальностей по энтропии распределения: 100% - одна эмоция,
+        0% - равномерное распределение по всем эмоциям
+        :param scores: массив ... x 7
+        :param mask: наличие модальностей, форма scores без последней оси
+        """
+        total = scores.sum(axis=-1, keepdims=True)
+        valid = mask & (total[..., 0] > 0)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            probabilities = np.where(total > 0, scores / total, 0.0)
+            plogp = np.where(probabilities > 0, probabilities * np.log2(probabilities), 0.0)
+        entropy = -plogp.sum(axis=-1)
+        max_entropy = np.log2(len(self.emotions))
+
+        return np.where(valid, (1 - entropy / max_entropy) * 100, 0.0)
+
     def _calculate_confidence(self, emotions: Optional[Dict[str, float]]) -> float:
         """Расчет уверенности для одной модальности"""
         if not emotions:
             return 0.0
-            
-        try:
-            # Находим максимальное значение эмоции
-            max_emotion = max(emotions.values())
-            # Нормализуем значения
-            total = sum(emotions.values())
-            
-            if total == 0:
-                return 0.0
-                
-            # Рассчитываем уверенность на основе распределения вероятностей
-            probabilities = [v/total for v in emotions.values()]
-            entropy = -sum(p * np.log2(p) if p > 0 else 0 for p in probabilities)
-            max_entropy = -np.log2(1/len(emotions))
-            
-            # Преобразуем в проценты
-            confidence = (1 - entropy/max_entropy) * 100
-            return confidence
-            
-        except Exception as e:
-            logger.error(f"Error calculating confidence: {e}")
-            return 0.0
+        scores = np.array([emotions.get(e, 0.0) for e in self.emotions], dtype=np.float64)
+        return float(self._calculate_confidence_batch(scores, np.array(True)))
 
     def create_visualization(self, results: Dict, save_path: str) -> None:
         """Создание итоговой визуализации"""
@@ -112,47 +298,15 @@ class EmotionFusion:
                 logger.error("No results to visualize")
                 return
             
-            plt.figure(figsize=(15, 10))
-            
-            # График уверенности по модальностям
-            plt.subplot(2, 1, 1)
+            # Шаблон фигуры строится один раз, обновляются только столбцы и подписи
             confidence_scores = results['confidence_scores']
-            bars = plt.bar(confidence_scores.keys(), confidence_scores.values())
-            plt.title('Confidence by Modality')
-            plt.ylabel('Confidence Score (%)')
-            
-            # Добавляем значения над столбцами
-            for bar in bars:
-                height = bar.get_height()
-                plt.text(bar.get_x() + bar.get_width()/2., height,
-                        f'{height:.1f}%', ha='center', va='bottom')
-            
-            # График итоговых эмоций
-            plt.subplot(2, 1, 2)
             emotions = results['emotions']
-            bars = plt.bar(emotions.keys(), emotions.values())
-            plt.title(f'Fused Emotions (Dominant: {results["dominant_emotion"].capitalize()})')
-            plt.xticks(rotation=45)
-            plt.ylabel('Confidence (%)')
-            
-            # Выделяем доминирующую эмоцию
-            dominant_idx = list(emotions.keys()).index(results['dominant_emotion'])
-            bars[dominant_idx].set_color('#FF3333')
-            
-            # Добавляем значения над столбцами
-            for bar in bars:
-                height = bar.get_height()
-                plt.text(bar.get_x() + bar.get_width()/2., height,
-                        f'{height:.1f}%', ha='center', va='bottom')
-            
-            plt.tight_layout()
-            
-            # Создаем директорию если нужно
-            os.makedirs(os.path.dirname(save_path), exist_ok=True)
-            
-            # Сохраняем визуализацию
-            plt.savefig(save_path, bbox_inches='tight', dpi=300)
-            plt.close()
+            get_template(FusionTemplate, self.dpi).render(
+                [confidence_scores.get(m, 0) for m in FusionTemplate.MODALITIES],
+                [emotions.get(e, 0) for e in self.emotions],
+                results['dominant_emotion'],
+                save_path
+            )
             
             logger.info(f"Visualization saved to: {save_path}")
             
@@ -182,6 +336,14 @@ def test_fusion():
             logger.info(f"Dominant emotion: {results['dominant_emotion']}")
             logger.info(f"Confidence scores: {results['confidence_scores']}")
             
+            # Разрыв в видео дольше max_gap: на шагах без данных нет доминирующей эмоции
+            video = [{'timestamp': t, 'emotions': test_emotions['video']} for t in (0.5, 1.5, 8.5, 9.5)]
+            records = fusion.temporal_records(fusion.fuse_temporal(video))
+            gap = [r for r in records if not r['modalities']]
+            if not gap or any(r['dominant_emotion'] is not None or r['emotions'] is not None for r in gap):
+                logger.error("Temporal fusion reports emotions for steps without data")
+                return False
+
             # Создаем тестовую визуализацию
             save_path = os.path.join('app', 'static', 'temp', 'test_fusion.png')
             fusion.create_visualization(results, save_path)
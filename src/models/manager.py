@@ -0,0 +1,118 @@
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class ModelManager:
+    """
+    Ленивая загрузка моделей по модальностям.
+
+    Модель загружается при первом обращении (get) или заранее, фоновым прогревом
+    (start_warmup): после загрузки вызывается warmup() модели - пробный прогон
+    на пустых данных, чтобы первый запрос не платил за инициализацию ядер.
+    Загрузка каждой модели выполняется один раз, параллельные get ждут ее окончания.
+    """
+
+    PENDING = 'pending'
+    LOADING = 'loading'
+    WARMING = 'warming'
+    READY = 'ready'
+    FAILED = 'failed'
+
+    def __init__(self, loaders):
+        """
+        :param loaders: {имя: функция без аргументов, создающая модель}
+        """
+        self.loaders = dict(loaders)
+        self._models = {}
+        self._locks = {name: threading.Lock() for name in self.loaders}
+        self._status = {
+            name: {'state': self.PENDING, 'load_seconds': None, 'warmup_seconds': None,
+                   'warmed': False, 'error': None}
+            for name in self.loaders
+        }
+
+    def get(self, name, warmup=False):
+        """
+        Модель по имени; при первом обращении загружается в вызывающем потоке
+        :param warmup: выполнить пробный прогон, если модель еще не прогрета
+                       (в том числе уже загруженную без прогрева, например до fork)
+        :raises RuntimeError: если загрузка не удалась (следующий get попробует снова)
+        """
+        status = self._status[name]
+        model = self._models.get(name)
+        if model is not None and (not warmup or status['warmed']):
+            return model
+
+        with self._locks[name]:
+            model = self._models.get(name)
+            if model is None:
+                try:
+                    status.update(state=self.LOADING, error=None)
+                    started = time.perf_counter()
+                    model = self.loaders[name]()
+                    status['load_seconds'] = round(time.perf_counter() - started, 3)
+                    logger.info(f"Model '{name}' loaded in {status['load_seconds']} s")
+                except Exception as e:
+                    logger.error(f"Error loading model '{name}': {e}")
+                    status.update(state=self.FAILED, error=str(e))
+                    raise RuntimeError(f"Model '{name}' is not available: {e}") from e
+
+            if warmup and not status['warmed'] and hasattr(model, 'warmup'):
+                status['state'] = self.WARMING
+                started = time.perf_counter()
+                try:
+                    model.warmup()
+                    status['warmup_seconds'] = round(time.perf_counter() - started, 3)
+                    logger.info(f"Model '{name}' warmed up in {status['warmup_seconds']} s")
+                except Exception as e:
+                    # Модель загружена и пригодна к работе, первый запрос просто будет медленнее
+                    logger.warning(f"Warm-up of model '{name}' failed: {e}")
+                    status['error'] = f"warm-up failed: {e}"
+                # Неудачный прогрев не повторяется
+                status['warmed'] = True
+
+            status['state'] = self.READY
+            self._models[name] = model
+            return model
+
+    def get_loaded(self, name):
+        """Модель, если она уже загружена, без загрузки"""
+        return self._models.get(name)
+
+    def load_all(self, warmup=False):
+        """Синхронная загрузка всех моделей"""
+        for name in self.loaders:
+            self.get(name, warmup=warmup)
+
+    def start_warmup(self, names=None):
+        """
+        Фоновая загрузка и прогрев моделей, по потоку на модель
+        :param names: имена моделей (по умолчанию все)
+        :return: список запущенных потоков
+        """
+        threads = []
+        for name in names or self.loaders:
+            thread = threading.Thread(
+                target=self._warmup, args=(name,), name=f'warmup-{name}', daemon=True
+            )
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    def _warmup(self, name):
+        try:
+            self.get(name, warmup=True)
+        except RuntimeError:
+            # Ошибка уже записана в статус; запрос к модели попробует загрузить ее снова
+            pass
+
+    def is_ready(self, name=None):
+        """Готовность модели (или всех моделей, если имя не указано)"""
+        names = [name] if name is not None else self.loaders
+        return all(self._status[n]['state'] == self.READY for n in names)
+
+    def status(self):
+        """Состояние, время загрузки и прогрева (сек), признак прогрева и ошибка по каждой модели"""
+        return {name: dict(status) for name, status in self._status.items()}
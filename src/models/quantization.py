@@ -0,0 +1,50 @@
+import logging
+import itertools
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+def quantize_linear_layers(model):
+    """
+    Динамическая int8-квантизация линейных слоев модели для инференса на CPU.
+    Веса хранятся в int8, активации квантуются на лету.
+    :param model: torch.nn.Module
+    :return: та же модель: линейные слои заменяются квантизованными на месте
+    """
+    # Подклассы nn.Linear (например, whisper.model.Linear) не попадают в таблицу
+    # квантизации, поэтому приводятся к nn.Linear: в fp32 на CPU их forward совпадает
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear) and type(module) is not torch.nn.Linear:
+            module.__class__ = torch.nn.Linear
+
+    size_before = model_size_mb(model)
+    # На месте: копия fp32-модели удвоила бы пиковую память при загрузке
+    model = torch.quantization.quantize_dynamic(
+        model.eval(), {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+    )
+    logger.info(f"Quantized {type(model).__name__}: {size_before:.0f} MB -> {model_size_mb(model):.0f} MB")
+    return model
+
+def quantize_pipeline(classifier):
+    """
+    Квантизация модели внутри transformers.pipeline
+    :return: тот же pipeline с квантизованной моделью
+    """
+    classifier.model = quantize_linear_layers(classifier.model)
+    return classifier
+
+def model_size_mb(model):
+    """
+    Размер весов модели в МБ по параметрам и буферам, без сериализации:
+    у динамически квантизованных слоев учитываются упакованные int8 веса
+    """
+    total = sum(t.numel() * t.element_size() for t in itertools.chain(model.parameters(), model.buffers()))
+    for module in model.modules():
+        # У квантизованного Linear weight() и bias() - методы, веса упакованы вне parameters()
+        weight = getattr(module, 'weight', None)
+        if callable(weight) and not isinstance(weight, torch.Tensor):
+            for tensor in (weight(), module.bias()):
+                if tensor is not None:
+                    total += tensor.numel() * tensor.element_size()
+    return total / 1024 / 1024
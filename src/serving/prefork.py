@@ -0,0 +1,190 @@
+import gc
+import os
+import sys
+import time
+import signal
+import socket
+import logging
+
+logger = logging.getLogger(__name__)
+
+def torch_modules(obj):
+    """
+    Модули PyTorch в атрибутах анализатора: сами nn.Module и модели внутри
+    transformers.pipeline (атрибут model)
+    """
+    torch = sys.modules.get('torch')
+    if torch is None:
+        return []
+
+    modules = []
+    for value in vars(obj).values():
+        if isinstance(value, torch.nn.Module):
+            modules.append(value)
+        elif isinstance(getattr(value, 'model', None), torch.nn.Module):
+            modules.append(value.model)
+    return modules
+
+def share_models(analyzers):
+    """
+    Подготовка загруженных моделей к fork.
+    Веса переносятся в разделяемую память (share_memory), поэтому страницы с тензорами
+    не копируются ни при каких записях рядом с ними, а объекты Python переводятся
+    в постоянное поколение сборщика мусора (gc.freeze): обход GC в воркерах не
+    трогает их заголовки и не разделяет страницы родителя.
+    :param analyzers: загруженные анализаторы
+    :return: количество модулей, перенесенных в разделяемую память
+    """
+    shared = 0
+    for analyzer in analyzers:
+        for module in torch_modules(analyzer):
+            module.eval()
+            module.share_memory()
+            shared += 1
+
+    gc.collect()
+    gc.freeze()
+    return shared
+
+def memory_usage(pid=None):
+    """
+    Память процесса в МБ по /proc/<pid>/smaps_rollup:
+    rss - резидентная, pss - с долей разделяемых страниц, uss - только собственные
+    страницы процесса (освободится при его завершении). Без smaps_rollup - только rss.
+    """
+    pid = pid or os.getpid()
+    fields = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1])
+    except OSError:
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        fields['Rss'] = int(line.split()[1])
+        except OSError:
+            return None
+
+    usage = {'rss': fields.get('Rss', 0) / 1024}
+    if 'Pss' in fields:
+        usage['pss'] = fields['Pss'] / 1024
+        usage['uss'] = (fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)) / 1024
+    return {key: round(value, 1) for key, value in usage.items()}
+
+class PreforkServer:
+    """
+    Обслуживание запросов несколькими процессами с общими моделями.
+
+    Родитель загружает модели, открывает сокет и порождает воркеры через fork:
+    веса остаются общими страницами (copy-on-write), каждый воркер принимает
+    соединения на унаследованном сокете. Упавший воркер перезапускается,
+    SIGTERM/SIGINT останавливают все процессы. Родитель периодически пишет в лог
+    собственную память (uss) каждого воркера для расчета числа воркеров на сервер.
+    """
+
+    def __init__(self, serve, host='0.0.0.0', port=5000, workers=2,
+                 before_fork=None, after_fork=None, report_interval=60.0):
+        """
+        :param serve: функция serve(sock), обслуживающая запросы в воркере
+        :param before_fork: вызывается в родителе один раз перед первым fork (загрузка моделей)
+        :param after_fork: вызывается в каждом воркере после fork
+        :param report_interval: период отчета о памяти воркеров в секундах (None - без отчета)
+        """
+        self.serve = serve
+        self.host = host
+        self.port = port
+        self.workers = max(1, int(workers))
+        self.before_fork = before_fork
+        self.after_fork = after_fork
+        self.report_interval = report_interval
+        self.children = {}
+        self._running = False
+
+    def _spawn(self, sock, index):
+        pid = os.fork()
+        if pid:
+            self.children[pid] = index
+            return pid
+
+        # Воркер: обработчики сигналов родителя не нужны
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        code = 0
+        try:
+            if self.after_fork is not None:
+                self.after_fork(index)
+            self.serve(sock)
+        except Exception as e:
+            logger.error(f"Worker {index} failed: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _stop(self, signum, frame):
+        self._running = False
+
+    def memory_report(self):
+        """Память родителя и воркеров: {pid: {'role', 'rss', 'pss', 'uss'}}"""
+        report = {os.getpid(): dict(memory_usage() or {}, role='parent')}
+        for pid, index in self.children.items():
+            report[pid] = dict(memory_usage(pid) or {}, role=f'worker-{index}')
+        return report
+
+    def _log_memory(self):
+        for pid, usage in self.memory_report().items():
+            logger.info(
+                f"{usage['role']} (pid {pid}): rss {usage.get('rss')} MB, "
+                f"pss {usage.get('pss')} MB, unique {usage.get('uss')} MB"
+            )
+
+    def run(self):
+        """Загрузка моделей, запуск воркеров и наблюдение за ними до сигнала остановки"""
+        sock = socket.create_server((self.host, self.port), backlog=128)
+        sock.set_inheritable(True)
+
+        if self.before_fork is not None:
+            self.before_fork()
+        logger.info(f"Parent memory before fork: {memory_usage()}")
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        self._running = True
+        for index in range(self.workers):
+            self._spawn(sock, index)
+        logger.info(f"Started {self.workers} workers on {self.host}:{self.port}: {list(self.children)}")
+
+        last_report = time.monotonic()
+        try:
+            while self._running:
+                try:
+                    pid, status = os.waitpid(-1, os.WNOHANG)
+                except ChildProcessError:
+                    pid = 0
+                if pid and pid in self.children:
+                    index = self.children.pop(pid)
+                    if self._running:
+                        logger.warning(f"Worker {index} (pid {pid}) exited with status {status}, restarting")
+                        self._spawn(sock, index)
+
+                if self.report_interval and time.monotonic() - last_report >= self.report_interval:
+                    self._log_memory()
+                    last_report = time.monotonic()
+                time.sleep(0.5)
+        finally:
+            logger.info("Stopping workers...")
+            for pid in list(self.children):
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+            for pid in list(self.children):
+                try:
+                    os.waitpid(pid, 0)
+                except ChildProcessError:
+                    pass
+            self.children.clear()
+            sock.close()
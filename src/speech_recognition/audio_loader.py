@@ -0,0 +1,213 @@
+import os
+import subprocess
+import logging
+from math import gcd, ceil
+
+import numpy as np
+from scipy.io import wavfile
+from scipy.signal import resample_poly
+
+logger = logging.getLogger(__name__)
+
+# Частота дискретизации, ожидаемая wav2vec2 и Whisper
+TARGET_SR = 16000
+
+class AudioData:
+    """
+    Аудио сессии, декодированное один раз: моно float32 в [-1, 1].
+    Передается в SpeechEmotionAnalyzer, TextEmotionAnalyzer и AudioVisualizer
+    вместо пути к файлу, чтобы каждый из них не декодировал файл заново.
+    """
+
+    def __init__(self, samples, sr, path=None, original_sr=None, channels=1,
+                 segments=None, source=None):
+        """
+        :param samples: одномерный массив float32
+        :param sr: частота дискретизации samples
+        :param path: исходный файл
+        :param original_sr: частота дискретизации исходного файла
+        :param channels: количество каналов в исходном файле
+        :param segments: для аудио только с речью - сегменты (start, end) исходной записи,
+                         из которых склеены samples
+        :param source: исходное AudioData, из которого выделена речь
+        """
+        # Производные представления, общие для этапов анализа (STFT, спектрограмма для отображения)
+        self.features = {}
+        self.samples = samples
+        self.sr = sr
+        self.path = path
+        self.original_sr = original_sr or sr
+        self.channels = channels
+        self.segments = segments
+        self.source = source
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sr
+
+    @property
+    def name(self):
+        """Имя файла для именования визуализаций"""
+        return os.path.basename(self.path) if self.path else 'audio'
+
+    @property
+    def original(self):
+        """Полная запись (для визуализации и длительности сессии)"""
+        return self.source if self.source is not None else self
+
+    def to_original_time(self, t, end=False):
+        """
+        Перевод времени в склеенном речевом аудио во время исходной записи
+        :param t: число или массив секунд
+        :param end: t - конец интервала; на стыке сегментов относится к концу предыдущего
+        """
+        if not self.segments:
+            return t
+
+        starts = np.array([start for start, _ in self.segments])
+        lengths = np.array([end - start for start, end in self.segments])
+        offsets = np.concatenate(([0.0], np.cumsum(lengths)[:-1]))
+
+        t = np.asarray(t, dtype=np.float64)
+        index = np.clip(np.searchsorted(offsets, t, side='left' if end else 'right') - 1, 0, len(offsets) - 1)
+        mapped = starts[index] + (t - offsets[index])
+        return float(mapped) if mapped.ndim == 0 else mapped
+
+    def get_activity_stats(self):
+        """Сколько аудио пропущено детектором речи"""
+        total = self.original.duration
+        speech = self.duration
+        return {
+            'total_duration': total,
+            'speech_duration': speech,
+            'skipped_duration': max(total - speech, 0.0),
+            'skipped_ratio': max(total - speech, 0.0) / total if total else 0.0,
+            'segments': len(self.segments) if self.segments else 0
+        }
+
+    def __repr__(self):
+        return f"AudioData({self.name}, {self.duration:.2f}s, {self.sr}Hz)"
+
+def normalize_samples(audio):
+    """Приведение целочисленных отсчетов к float32 в [-1, 1]"""
+    if audio.dtype == np.uint8:
+        return (audio.astype(np.float32) - 128.0) / 128.0
+    if np.issubdtype(audio.dtype, np.integer):
+        return audio.astype(np.float32) / float(np.iinfo(audio.dtype).max + 1)
+    return audio.astype(np.float32)
+
+class WavStreamReader:
+    """
+    Потоковое чтение WAV: файл отображается в память (mmap), а нормализованные
+    моно-чанки с частотой sr выдаются лениво через итератор. Пиковая память
+    определяется размером чанка, а не длиной записи.
+    """
+
+    # Признак потокового источника для анализаторов
+    streaming = True
+
+    def __init__(self, path, sr=TARGET_SR, chunk_seconds=30.0):
+        """
+        :param path: путь к WAV файлу
+        :param sr: частота дискретизации выдаваемых чанков
+        :param chunk_seconds: длительность чанка в секундах
+        """
+        self.path = path
+        self.sr = sr
+        self.original_sr, self._data = wavfile.read(path, mmap=True)
+        self.channels = 1 if self._data.ndim == 1 else self._data.shape[1]
+
+        factor = gcd(int(self.original_sr), int(sr))
+        self._up = sr // factor
+        self._down = self.original_sr // factor
+
+        # Границы чанков кратны down, чтобы выходные отсчеты совпадали с передискретизацией целиком;
+        # поля по краям убирают краевые эффекты фильтра
+        self.chunk_samples = max(self._down, int(chunk_seconds * self.original_sr) // self._down * self._down)
+        self._margin = self._down * ceil(1024 / self._down)
+
+    @property
+    def num_samples(self):
+        """Количество отсчетов на выходе (с частотой sr)"""
+        return ceil(len(self._data) * self._up / self._down)
+
+    @property
+    def duration(self):
+        return len(self._data) / self.original_sr
+
+    @property
+    def name(self):
+        return os.path.basename(self.path)
+
+    def __iter__(self):
+        """
+        :return: (время начала чанка в секундах, float32 моно-чанк с частотой sr)
+        """
+        total = len(self._data)
+        for start in range(0, total, self.chunk_samples):
+            end = min(start + self.chunk_samples, total)
+
+            if self._up == self._down:
+                yield start / self.original_sr, self._mono(self._data[start:end])
+                continue
+
+            low = max(start - self._margin, 0)
+            high = min(end + self._margin, total)
+            resampled = resample_poly(self._mono(self._data[low:high]), self._up, self._down)
+
+            skip = (start - low) * self._up // self._down
+            length = ceil((end - start) * self._up / self._down)
+            yield start / self.original_sr, resampled[skip:skip + length].astype(np.float32)
+
+    def _mono(self, block):
+        """Нормализация и сведение каналов для одного блока"""
+        block = normalize_samples(np.asarray(block))
+        if block.ndim > 1:
+            block = block.mean(axis=1)
+        return block
+
+    def __repr__(self):
+        return f"WavStreamReader({self.name}, {self.duration:.2f}s, {self.original_sr}Hz -> {self.sr}Hz)"
+
+def load_audio(path, sr=TARGET_SR):
+    """
+    Декодирование аудио в моно float32 с частотой sr
+    WAV читается через mmap по чанкам, остальные форматы декодируются через ffmpeg
+    :return: AudioData или None в случае ошибки
+    """
+    try:
+        logger.info(f"Loading audio: {path}")
+        try:
+            reader = WavStreamReader(path, sr=sr)
+        except ValueError:
+            # Не WAV (например, webm из браузера) - один вызов ffmpeg сразу в нужный формат
+            return _load_with_ffmpeg(path, sr)
+
+        # Чанки пишутся сразу в итоговый буфер, без промежуточных копий всего сигнала
+        audio = np.empty(reader.num_samples, dtype=np.float32)
+        position = 0
+        for _, chunk in reader:
+            audio[position:position + len(chunk)] = chunk
+            position += len(chunk)
+
+        data = AudioData(audio[:position], sr, path=path,
+                         original_sr=reader.original_sr, channels=reader.channels)
+        logger.info(f"Audio loaded: {data}")
+        return data
+
+    except Exception as e:
+        logger.error(f"Error loading audio {path}: {e}")
+        return None
+
+def _load_with_ffmpeg(path, sr):
+    """Декодирование произвольного контейнера через ffmpeg"""
+    cmd = [
+        'ffmpeg', '-nostdin', '-threads', '0', '-i', path,
+        '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(sr), '-'
+    ]
+    output = subprocess.run(cmd, capture_output=True, check=True).stdout
+    audio = np.frombuffer(output, np.int16).astype(np.float32) / 32768.0
+
+    data = AudioData(audio, sr, path=path)
+    logger.info(f"Audio decoded with ffmpeg: {data}")
+    return data
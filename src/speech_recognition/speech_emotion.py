@@ -1,6 +1,5 @@
 import os
 import numpy as np
-from scipy.io import wavfile
 from transformers import pipeline
 import warnings
 import logging
@@ -8,12 +7,37 @@ import sys
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from visualizer.audio_visualizer import AudioVisualizer
+from speech_recognition.audio_loader import load_audio, WavStreamReader
+from models.quantization import quantize_pipeline
 
 logger = logging.getLogger(__name__)
 
 class SpeechEmotionAnalyzer:
-    def __init__(self):
-        """Инициализация анализатора речи"""
+    # Метки модели wav2vec2 -> базовые эмоции ('calm' не имеет аналога)
+    LABEL_MAPPING = {
+        'angry': 'angry',
+        'disgust': 'disgust',
+        'fearful': 'fear',
+        'happy': 'happy',
+        'sad': 'sad',
+        'surprised': 'surprise',
+        'neutral': 'neutral'
+    }
+
+    # Длина окна по умолчанию для потокового режима (сек)
+    STREAM_WINDOW_LENGTH = 5.0
+
+    def __init__(self, window_length=None, hop_length=None, batch_size=8,
+                 streaming=False, chunk_seconds=30.0, quantize=False):
+        """
+        Инициализация анализатора речи
+        :param window_length: длина окна в секундах; None - вся запись одним вызовом модели
+        :param hop_length: шаг окон в секундах (по умолчанию половина окна)
+        :param batch_size: количество окон в одном вызове модели
+        :param streaming: читать WAV через mmap по чанкам, не загружая запись целиком
+        :param chunk_seconds: длительность чанка в потоковом режиме
+        :param quantize: int8-квантизация линейных слоев модели (быстрее и меньше памяти на CPU)
+        """
         try:
             # Подавляем предупреждения при загрузке модели
             with warnings.catch_warnings():
@@ -22,8 +46,17 @@ class SpeechEmotionAnalyzer:
                     "audio-classification",
                     model="ehcalabres/wav2vec2-lg-xlsr-en-speech-emotion-recognition"
                 )
+                if quantize:
+                    quantize_pipeline(self.emotion_classifier)
             
             self.emotions = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+            # Запрашиваем оценки всех меток, а не top-5 по умолчанию
+            self.top_k = len(self.emotion_classifier.model.config.id2label)
+            self.window_length = window_length
+            self.hop_length = hop_length
+            self.batch_size = max(1, int(batch_size))
+            self.streaming = streaming
+            self.chunk_seconds = chunk_seconds
             self.visualizer = AudioVisualizer()
             logger.info("SpeechEmotionAnalyzer initialized successfully")
             
@@ -31,65 +64,220 @@ class SpeechEmotionAnalyzer:
             logger.error(f"Error initializing SpeechEmotionAnalyzer: {e}")
             raise
 
+    def warmup(self):
+        """Пробный прогон модели на секунде тишины"""
+        sr = 16000
+        self._classify_windows([(0, sr, np.zeros(sr, dtype=np.float32))], sr, self._new_accumulator())
+
     def read_and_normalize_audio(self, audio_path):
-        """Чтение и нормализация аудио файла"""
-        try:
-            logger.info(f"Reading audio file: {audio_path}")
-            sr, audio = wavfile.read(audio_path)
-            
-            # Нормализация аудио
-            audio = audio.astype(np.float32)
-            if audio.max() > 1.0:
-                audio = audio / 32768.0
-                
-            logger.info(f"Audio loaded: {len(audio)} samples, {sr}Hz, duration: {len(audio)/sr:.2f}s")
-            return audio, sr
-            
-        except Exception as e:
-            logger.error(f"Error reading audio file: {e}")
+        """Чтение и нормализация аудио файла (моно, 16 кГц, float32)"""
+        audio = load_audio(audio_path)
+        if audio is None:
             return None, None
+        return audio.samples, audio.sr
+
+    def _to_emotions(self, predictions):
+        """Преобразование предсказаний pipeline в словарь базовых эмоций (%)"""
+        emotions = {emotion: 0.0 for emotion in self.emotions}
+        for pred in predictions:
+            label = self.LABEL_MAPPING.get(pred['label'].lower())
+            if label is not None:
+                emotions[label] = pred['score'] * 100
+        return emotions
+
+    def _window_starts(self, num_samples, window, hop):
+        """Начала окон; последнее окно выравнивается по концу записи"""
+        if num_samples <= window:
+            return [0]
+        starts = list(range(0, num_samples - window + 1, hop))
+        if starts[-1] + window < num_samples:
+            starts.append(num_samples - window)
+        return starts
+
+    def _window_params(self, window_length, hop_length, batch_size, default_window=None):
+        """Параметры окон с учетом значений по умолчанию"""
+        window_length = window_length or self.window_length or default_window
+        hop_length = hop_length or self.hop_length or window_length / 2
+        batch_size = max(1, int(batch_size or self.batch_size))
+        return window_length, hop_length, batch_size
+
+    def _new_accumulator(self):
+        """Накопитель результатов оконного анализа"""
+        return {'timeline': [], 'weighted': np.zeros(len(self.emotions)), 'duration': 0.0}
+
+    def _classify_windows(self, windows, sr, accumulator, to_time=None):
+        """
+        Классификация пакета окон одним вызовом модели
+        :param windows: список (start, end, samples) с границами в отсчетах
+        :param accumulator: накопитель из _new_accumulator
+        :param to_time: перевод секунд на шкалу исходной записи (для аудио после VAD)
+        """
+        if not windows:
+            return
+
+        to_time = to_time or (lambda t, end=False: t)
+        inputs = [{'raw': samples, 'sampling_rate': sr} for _, _, samples in windows]
+        predictions = self.emotion_classifier(inputs, batch_size=len(inputs), top_k=self.top_k)
+
+        for (start, end, _), preds in zip(windows, predictions):
+            emotions = self._to_emotions(preds)
+            duration = (end - start) / sr
 
-    def analyze_emotion(self, audio_path):
+            accumulator['timeline'].append({
+                'timestamp': to_time((start + end) / 2 / sr),
+                'start': to_time(start / sr),
+                'end': to_time(end / sr, end=True),
+                'emotions': emotions
+            })
+            accumulator['weighted'] += duration * np.array([emotions[e] for e in self.emotions])
+            accumulator['duration'] += duration
+
+    def _window_average(self, accumulator):
+        """Среднее по окнам, взвешенное по их длительности"""
+        total = accumulator['duration']
+        return {
+            emotion: float(value / total) if total else 0.0
+            for emotion, value in zip(self.emotions, accumulator['weighted'])
+        }
+
+    def analyze_windows(self, audio, window_length=None, hop_length=None, batch_size=None):
         """
-        Анализ эмоций в аудио файле
-        :param audio_path: путь к аудио файлу
+        Оконный анализ: перекрывающиеся окна фиксированной длины классифицируются пакетами
+        :param audio: AudioData
+        :return: (timeline, среднее, взвешенное по длительности окон)
+        """
+        window_length, hop_length, batch_size = self._window_params(window_length, hop_length, batch_size)
+
+        samples, sr = audio.samples, audio.sr
+        window = int(window_length * sr)
+        hop = max(1, int(hop_length * sr))
+        starts = self._window_starts(len(samples), window, hop)
+        logger.info(
+            f"Windowed analysis: {len(starts)} windows of {window_length}s, "
+            f"hop {hop_length}s, batch size {batch_size}"
+        )
+
+        accumulator = self._new_accumulator()
+        for i in range(0, len(starts), batch_size):
+            # Срезы - представления исходного массива, копии создаются только внутри пакета
+            windows = [
+                (start, min(start + window, len(samples)), samples[start:start + window])
+                for start in starts[i:i + batch_size]
+            ]
+            self._classify_windows(windows, sr, accumulator, audio.to_original_time)
+
+        return accumulator['timeline'], self._window_average(accumulator)
+
+    def analyze_stream(self, reader, window_length=None, hop_length=None, batch_size=None,
+                       on_chunk=None):
+        """
+        Оконный анализ потокового источника (WavStreamReader).
+        В памяти одновременно находятся только текущий чанк и хвост предыдущего.
+        :param on_chunk: вызывается для каждого чанка (например, накопление спектрограммы)
+        :return: (timeline, среднее, взвешенное по длительности окон)
+        """
+        window_length, hop_length, batch_size = self._window_params(
+            window_length, hop_length, batch_size, default_window=self.STREAM_WINDOW_LENGTH
+        )
+        sr = reader.sr
+        window = int(window_length * sr)
+        hop = max(1, int(hop_length * sr))
+        logger.info(f"Streaming analysis: {reader}, windows of {window_length}s, hop {hop_length}s")
+
+        accumulator = self._new_accumulator()
+        buffer = np.empty(0, dtype=np.float32)
+        buffer_start = 0  # номер отсчета потока, соответствующий buffer[0]
+        next_start = 0
+        last_end = 0
+        pending = []
+
+        for _, chunk in reader:
+            if on_chunk is not None:
+                on_chunk(chunk)
+            buffer = np.concatenate((buffer, chunk))
+            buffer_end = buffer_start + len(buffer)
+
+            while next_start + window <= buffer_end:
+                offset = next_start - buffer_start
+                pending.append((next_start, next_start + window, buffer[offset:offset + window]))
+                last_end = next_start + window
+                next_start += hop
+                if len(pending) >= batch_size:
+                    self._classify_windows(pending, sr, accumulator)
+                    pending = []
+
+            # Оставляем только то, что понадобится следующим окнам и последнему окну
+            keep_from = max(min(next_start, buffer_end - window), buffer_start)
+            buffer = buffer[keep_from - buffer_start:]
+            buffer_start = keep_from
+
+        # Последнее окно выравнивается по концу записи, как в analyze_windows
+        buffer_end = buffer_start + len(buffer)
+        if last_end < buffer_end:
+            start = max(buffer_end - window, 0)
+            pending.append((start, buffer_end, buffer[start - buffer_start:]))
+        self._classify_windows(pending, sr, accumulator)
+
+        return accumulator['timeline'], self._window_average(accumulator)
+
+    def analyze_emotion(self, audio, window_length=None, hop_length=None, batch_size=None,
+                        visualize=True):
+        """
+        Анализ эмоций в аудио
+        :param audio: путь к аудио файлу, AudioData, декодированное один раз на сессию,
+                      или WavStreamReader для длинных записей
+        :param window_length: длина окна в секундах (по умолчанию self.window_length)
+        :param hop_length: шаг окон в секундах (по умолчанию self.hop_length)
+        :param batch_size: окон в одном вызове модели (по умолчанию self.batch_size)
+        :param visualize: строить визуализацию сразу; False - график строится отдельно
+                          (например, RenderWorker по запросу), 'visualization_path' = None
         :return: результаты анализа
         """
         try:
-            logger.info(f"Starting audio analysis: {audio_path}")
+            logger.info(f"Starting audio analysis: {audio}")
             
-            # Загружаем аудио
-            audio, sr = self.read_and_normalize_audio(audio_path)
+            # Загружаем аудио, если передан путь
+            if isinstance(audio, str):
+                if self.streaming:
+                    audio = WavStreamReader(audio, chunk_seconds=self.chunk_seconds)
+                else:
+                    audio = load_audio(audio)
             if audio is None:
                 return None
+
+            if getattr(audio, 'streaming', False):
+                return self._analyze_streaming(audio, window_length, hop_length, batch_size, visualize)
                 
-            duration = len(audio) / sr
-            
-            # Анализируем эмоции
-            result = self.emotion_classifier(audio_path)
+            duration = audio.original.duration
             
-            # Преобразуем результаты
-            emotions = {emotion: 0.0 for emotion in self.emotions}
-            for pred in result:
-                label = pred['label'].lower()
-                if label in self.emotions:
-                    emotions[label] = pred['score'] * 100
+            timeline = None
+            if window_length or self.window_length:
+                # Оконный режим: ограниченная память и временная шкала
+                timeline, emotions = self.analyze_windows(audio, window_length, hop_length, batch_size)
+            else:
+                # Анализируем эмоции на уже декодированном сигнале, без повторного вызова ffmpeg
+                result = self.emotion_classifier(
+                    {'raw': audio.samples, 'sampling_rate': audio.sr},
+                    top_k=self.top_k
+                )
+                emotions = self._to_emotions(result)
             
             # Определяем доминирующую эмоцию
             dominant_emotion = max(emotions.items(), key=lambda x: x[1])[0]
             
             # Создаем визуализацию
-            visualization_path = os.path.join(
-                'app', 'static', 'temp',
-                f'audio_visualization_{os.path.basename(audio_path)}.png'
-            )
-            
-            self.visualizer.create_visualization(
-                audio_data=audio,
-                sr=sr,
-                emotions=emotions,
-                save_path=visualization_path
-            )
+            visualization_path = None
+            if visualize:
+                visualization_path = os.path.join(
+                    'app', 'static', 'temp',
+                    f'audio_visualization_{audio.name}.png'
+                )
+                
+                self.visualizer.create_visualization(
+                    audio_data=audio.original,
+                    emotions=emotions,
+                    save_path=visualization_path
+                )
             
             results = {
                 'average': emotions,
@@ -97,6 +285,10 @@ class SpeechEmotionAnalyzer:
                 'duration': duration,
                 'visualization_path': visualization_path
             }
+            if timeline is not None:
+                results['timeline'] = timeline
+            if audio.segments:
+                results['voice_activity'] = audio.get_activity_stats()
             
             logger.info(f"Audio analysis completed. Dominant emotion: {dominant_emotion}")
             return results
@@ -105,6 +297,42 @@ class SpeechEmotionAnalyzer:
             logger.error(f"Error analyzing speech emotion: {e}")
             return None
 
+    def _analyze_streaming(self, reader, window_length=None, hop_length=None, batch_size=None,
+                           visualize=True):
+        """Анализ длинной записи без загрузки в память целиком"""
+        # Спектрограмма накапливается по тем же чанкам, второго прохода по файлу нет
+        spectrogram = None
+        if visualize:
+            spectrogram = self.visualizer.spectrogram_accumulator(reader.num_samples, reader.sr)
+        timeline, emotions = self.analyze_stream(
+            reader, window_length, hop_length, batch_size,
+            on_chunk=spectrogram.add if spectrogram is not None else None
+        )
+        dominant_emotion = max(emotions.items(), key=lambda x: x[1])[0]
+
+        visualization_path = None
+        if visualize:
+            visualization_path = os.path.join(
+                'app', 'static', 'temp',
+                f'audio_visualization_{reader.name}.png'
+            )
+            self.visualizer.create_visualization(
+                emotions=emotions,
+                save_path=visualization_path,
+                spectrogram=spectrogram.finish()
+            )
+
+        results = {
+            'average': emotions,
+            'dominant_emotion': dominant_emotion,
+            'duration': reader.duration,
+            'visualization_path': visualization_path,
+            'timeline': timeline
+        }
+
+        logger.info(f"Streaming audio analysis completed. Dominant emotion: {dominant_emotion}")
+        return results
+
 def test_analyzer():
     """Тестирование анализатора"""
     try:
@@ -0,0 +1,158 @@
+import os
+import sys
+import logging
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from speech_recognition.audio_loader import AudioData
+
+logger = logging.getLogger(__name__)
+
+class VoiceActivityDetector:
+    """
+    Детектор речи по энергии и частоте переходов через ноль.
+
+    Порог энергии адаптивный: уровень шума (нижний перцентиль энергии кадров)
+    плюс запас в дБ. Оценке уровня шума доверяют, только если в записи есть
+    настоящая тишина: перцентиль заметно ниже медианы и не выше абсолютного
+    потолка шума. Иначе (сплошная речь, тон) перцентиль лежит внутри речи,
+    и действует только абсолютный порог min_energy_db. Глухие согласные с энергией чуть ниже порога
+    распознаются по высокой частоте переходов через ноль. Сегменты
+    сглаживаются: короткие паузы склеиваются, короткие всплески отбрасываются.
+    """
+
+    def __init__(self, frame_ms=30, hop_ms=10, energy_margin_db=12.0, min_energy_db=-55.0,
+                 max_noise_db=-40.0, min_spread_db=6.0,
+                 zcr_threshold=0.25, min_speech=0.25, min_silence=0.3, padding=0.15,
+                 block_seconds=60):
+        """
+        :param frame_ms: длина кадра анализа в миллисекундах
+        :param hop_ms: шаг кадров в миллисекундах
+        :param energy_margin_db: превышение уровня шума, начиная с которого кадр считается речью
+        :param min_energy_db: абсолютный нижний порог энергии
+        :param max_noise_db: оценка шума выше этого уровня считается речью, а не шумом
+        :param min_spread_db: минимальная разница медианы и перцентиля шума,
+                              при которой в записи есть тишина
+        :param zcr_threshold: частота переходов через ноль для глухих согласных
+        :param min_speech: минимальная длительность сегмента речи (сек)
+        :param min_silence: паузы короче этого значения (сек) не разрывают сегмент
+        :param padding: расширение сегментов с каждой стороны (сек)
+        :param block_seconds: размер блока обработки, ограничивает пиковую память
+        """
+        self.frame_ms = frame_ms
+        self.hop_ms = hop_ms
+        self.energy_margin_db = energy_margin_db
+        self.min_energy_db = min_energy_db
+        self.max_noise_db = max_noise_db
+        self.min_spread_db = min_spread_db
+        self.zcr_threshold = zcr_threshold
+        self.min_speech = min_speech
+        self.min_silence = min_silence
+        self.padding = padding
+        self.block_seconds = block_seconds
+
+    def detect(self, audio):
+        """
+        Поиск сегментов речи
+        :param audio: AudioData
+        :return: список (start, end) в секундах
+        """
+        sr = audio.sr
+        frame = max(1, int(sr * self.frame_ms / 1000))
+        hop = max(1, int(sr * self.hop_ms / 1000))
+
+        if len(audio.samples) < frame:
+            return [(0.0, audio.duration)] if len(audio.samples) else []
+
+        energy, zcr = self._frame_features(audio.samples, frame, hop, sr)
+
+        threshold = self._energy_threshold(energy)
+        voiced = energy > threshold
+        # Глухие согласные: энергия немного ниже порога, но много переходов через ноль
+        voiced |= (energy > threshold - 6.0) & (zcr > self.zcr_threshold)
+
+        # Границы участков подряд идущих речевых кадров
+        edges = np.diff(np.concatenate(([0], voiced.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1) * hop / sr
+        ends = (np.flatnonzero(edges == -1) - 1) * hop / sr + frame / sr
+
+        return self._smooth(list(zip(starts.tolist(), ends.tolist())), audio.duration)
+
+    def _energy_threshold(self, energy):
+        """Порог энергии речи (дБ) по распределению энергии кадров"""
+        noise_floor, median = np.percentile(energy, [10, 50])
+        if median - noise_floor < self.min_spread_db or noise_floor > self.max_noise_db:
+            # Тишины в записи нет: перцентиль лежит внутри речи
+            logger.debug(
+                f"VAD: no silence to estimate noise (p10 {noise_floor:.1f} dB, "
+                f"median {median:.1f} dB), using absolute threshold"
+            )
+            return self.min_energy_db
+        return max(noise_floor + self.energy_margin_db, self.min_energy_db)
+
+    def _frame_features(self, samples, frame, hop, sr):
+        """Энергия (дБ) и частота переходов через ноль по кадрам, блоками"""
+        block = max(frame, int(self.block_seconds * sr) // hop * hop)
+        energies, zcrs = [], []
+
+        for offset in range(0, len(samples) - frame + 1, block):
+            chunk = samples[offset:offset + block + frame - hop]
+            if len(chunk) < frame:
+                break
+            frames = sliding_window_view(chunk, frame)[::hop]
+            energies.append(10 * np.log10(np.mean(np.square(frames, dtype=np.float32), axis=1) + 1e-10))
+            zcrs.append(np.mean(np.diff(np.signbit(frames), axis=1), axis=1))
+
+        return np.concatenate(energies), np.concatenate(zcrs)
+
+    def _smooth(self, segments, duration):
+        """Склейка коротких пауз, удаление коротких сегментов и расширение границ"""
+        merged = []
+        for start, end in segments:
+            if merged and start - merged[-1][1] < self.min_silence:
+                merged[-1][1] = end
+            else:
+                merged.append([start, end])
+
+        result = []
+        for start, end in merged:
+            if end - start < self.min_speech:
+                continue
+            start = max(0.0, start - self.padding)
+            end = min(duration, end + self.padding)
+            if result and start <= result[-1][1]:
+                result[-1] = (result[-1][0], end)
+            else:
+                result.append((start, end))
+        return result
+
+    def apply(self, audio):
+        """
+        Выделение речи: возвращает AudioData только с речевыми участками.
+        Временные метки переводятся обратно через AudioData.to_original_time.
+        Если речь не найдена, возвращается исходное аудио.
+        """
+        segments = self.detect(audio)
+        if not segments:
+            logger.warning("No speech detected, using full audio")
+            return audio
+
+        pieces = [audio.samples[int(start * audio.sr):int(end * audio.sr)] for start, end in segments]
+        voiced = AudioData(
+            np.concatenate(pieces),
+            audio.sr,
+            path=audio.path,
+            original_sr=audio.original_sr,
+            channels=audio.channels,
+            segments=segments,
+            source=audio
+        )
+
+        stats = voiced.get_activity_stats()
+        logger.info(
+            f"VAD: {stats['speech_duration']:.2f}s of speech in {stats['total_duration']:.2f}s, "
+            f"skipped {stats['skipped_duration']:.2f}s ({stats['skipped_ratio'] * 100:.0f}%)"
+        )
+        return voiced
@@ -0,0 +1,175 @@
+import os
+import sys
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from speech_recognition.voice_activity import VoiceActivityDetector
+
+logger = logging.getLogger(__name__)
+
+# Модель Whisper процесса-воркера, загружается один раз в инициализаторе пула
+_worker_model = None
+
+def _init_worker(model_name, quantize, threads):
+    """Инициализатор процесса пула: собственная модель и ограничение потоков torch"""
+    global _worker_model
+    import torch
+    import whisper
+
+    torch.set_num_threads(threads)
+    _worker_model = whisper.load_model(model_name, device="cpu")
+    if quantize:
+        from models.quantization import quantize_linear_layers
+        _worker_model = quantize_linear_layers(_worker_model)
+
+def _transcribe_chunk(samples, language):
+    """Распознавание одного чанка в процессе пула"""
+    result = _worker_model.transcribe(samples, language=language, fp16=False)
+    return {
+        'text': result['text'],
+        'segments': [
+            {'start': segment['start'], 'end': segment['end'], 'text': segment['text']}
+            for segment in result.get('segments', [])
+        ]
+    }
+
+def split_at_silences(audio, chunk_seconds=30.0, search_seconds=10.0, vad=None, min_chunk_seconds=1.0):
+    """
+    Разбиение аудио на чанки не длиннее chunk_seconds по самым тихим местам
+    :param audio: AudioData
+    :param search_seconds: граница ищется в последних search_seconds каждого чанка
+                           (не больше половины chunk_seconds, иначе чанки вырождаются)
+    :param min_chunk_seconds: минимальная длина последнего чанка - каждый чанк стоит
+                              полного вызова Whisper
+    :return: список (start, end) в отсчетах
+    """
+    sr = audio.sr
+    total = len(audio.samples)
+    chunk = int(chunk_seconds * sr)
+    if total <= chunk:
+        return [(0, total)]
+
+    # Каждый чанк, кроме последнего, не короче половины chunk_seconds
+    search = min(int(search_seconds * sr), chunk // 2)
+    min_chunk = min(int(min_chunk_seconds * sr), chunk // 2)
+
+    # Энергия кадров считается так же, как в детекторе речи
+    vad = vad or VoiceActivityDetector()
+    frame = max(1, int(sr * vad.frame_ms / 1000))
+    hop = max(1, int(sr * vad.hop_ms / 1000))
+    energy, _ = vad._frame_features(audio.samples, frame, hop, sr)
+
+    # Стыки склеенных речевых сегментов после VAD - заведомо паузы
+    if audio.segments:
+        lengths = np.array([end - start for start, end in audio.segments])
+        joints = (np.cumsum(lengths)[:-1] * sr / hop).astype(int)
+        energy = energy.copy()
+        energy[joints[joints < len(energy)]] = -np.inf
+
+    bounds = []
+    start = 0
+    while total - start > chunk:
+        low = (start + chunk - search) // hop
+        high = max(low, (min(start + chunk, total - min_chunk) - frame) // hop)
+        cut = (low + int(np.argmin(energy[low:high + 1]))) * hop + frame // 2
+        bounds.append((start, cut))
+        start = cut
+    bounds.append((start, total))
+    return bounds
+
+class ParallelTranscriber:
+    """
+    Распознавание длинных записей: аудио режется по паузам на чанки около 30 секунд,
+    чанки распознаются параллельно в пуле процессов (у каждого процесса своя модель
+    Whisper), тексты и временные метки сегментов склеиваются в исходном порядке.
+    """
+
+    def __init__(self, model_name="small", workers=2, chunk_seconds=30.0, quantize=False,
+                 language='russian'):
+        """
+        :param model_name: модель Whisper
+        :param workers: количество процессов
+        :param chunk_seconds: максимальная длина чанка в секундах
+        :param quantize: int8-квантизация модели в воркерах
+        """
+        self.model_name = model_name
+        self.workers = max(1, int(workers))
+        self.chunk_seconds = chunk_seconds
+        self.quantize = quantize
+        self.language = language
+        self._executor = None
+
+    def _get_executor(self):
+        """Пул создается при первом использовании и переиспользуется между сессиями"""
+        if self._executor is None:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            logger.info(f"Starting {self.workers} transcription workers ({threads} threads each)")
+            # spawn: fork процесса с уже инициализированным torch может зависнуть
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.model_name, self.quantize, threads)
+            )
+        return self._executor
+
+    def transcribe(self, audio):
+        """
+        :param audio: AudioData (16 кГц моно)
+        :return: {'text', 'segments'} со временем на шкале audio.samples
+        :raises BrokenProcessPool: если процесс пула упал и на новом пуле
+        """
+        bounds = split_at_silences(audio, self.chunk_seconds)
+        logger.info(f"Transcribing {audio} in {len(bounds)} chunks")
+
+        try:
+            results = self._transcribe_chunks(audio, bounds)
+        except BrokenProcessPool:
+            # Процесс пула упал (например, нехватка памяти на длинном чанке): сломанный пул
+            # не переиспользуется, чанки распознаются один раз заново на новом пуле
+            logger.error("Transcription worker crashed, retrying on a new pool")
+            self._reset_executor()
+            try:
+                results = self._transcribe_chunks(audio, bounds)
+            except BrokenProcessPool:
+                self._reset_executor()
+                raise
+
+        texts, segments = [], []
+        for (start, _), result in zip(bounds, results):
+            offset = start / audio.sr
+            texts.append(result['text'].strip())
+            segments.extend(
+                dict(segment, start=segment['start'] + offset, end=segment['end'] + offset)
+                for segment in result['segments']
+            )
+
+        return {
+            'text': ' '.join(text for text in texts if text),
+            'segments': segments
+        }
+
+    def _transcribe_chunks(self, audio, bounds):
+        executor = self._get_executor()
+        futures = [
+            executor.submit(_transcribe_chunk, audio.samples[start:end], self.language)
+            for start, end in bounds
+        ]
+        return [future.result() for future in futures]
+
+    def _reset_executor(self):
+        """Сброс сломанного пула: следующий вызов создаст новый"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def close(self):
+        """Остановка процессов пула"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -1,24 +1,66 @@
 import whisper
 from transformers import pipeline
-from deep_translator import GoogleTranslator
 import warnings
 import logging
 import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from models.quantization import quantize_linear_layers, quantize_pipeline
+from text_analysis.translator import CachedTranslator, DEFAULT_CACHE_DIR
+from text_analysis.parallel_transcriber import ParallelTranscriber
+from speech_recognition.audio_loader import load_audio
 
 logger = logging.getLogger(__name__)
 
 class TextEmotionAnalyzer:
-    def __init__(self):
-        """Инициализация анализатора текста"""
+    # Метки модели roberta -> базовые эмоции
+    LABEL_MAPPING = {
+        'anger': 'angry',
+        'disgust': 'disgust',
+        'fear': 'fear',
+        'joy': 'happy',
+        'sadness': 'sad',
+        'surprise': 'surprise',
+        'neutral': 'neutral'
+    }
+
+    def __init__(self, quantize=False, translator='google', translation_cache_dir=DEFAULT_CACHE_DIR,
+                 batch_size=16, transcribe_workers=0, long_audio_seconds=120.0):
+        """
+        Инициализация анализатора текста
+        :param quantize: int8-квантизация линейных слоев Whisper и классификатора
+        :param translator: бэкенд перевода ('google', 'marian' - локальная модель, 'dictionary'),
+                           объект CachedTranslator или None - без перевода, если классификатор
+                           принимает русский текст напрямую
+        :param translation_cache_dir: каталог дискового кэша переводов (None - только в памяти)
+        :param batch_size: сегментов транскрипта в одном пакете классификатора
+        :param transcribe_workers: процессов для параллельного распознавания длинных записей
+                                   (0 - всегда последовательно)
+        :param long_audio_seconds: записи длиннее этого значения распознаются параллельно
+        """
         try:
             with warnings.catch_warnings():
                 warnings.simplefilter("ignore")
                 
                 logger.info("Loading Whisper model...")
-                self.speech_model = whisper.load_model("small")
+                # Квантизованные слои работают только на CPU
+                self.speech_model = whisper.load_model("small", device="cpu" if quantize else None)
+                if quantize:
+                    self.speech_model = quantize_linear_layers(self.speech_model)
+
+                self.long_audio_seconds = long_audio_seconds
+                self.parallel_transcriber = None
+                if transcribe_workers:
+                    self.parallel_transcriber = ParallelTranscriber(
+                        "small", workers=transcribe_workers, quantize=quantize
+                    )
                 
                 logger.info("Initializing translator...")
-                self.translator = GoogleTranslator(source='ru', target='en')
+                if isinstance(translator, str):
+                    translator = CachedTranslator(translator, cache_dir=translation_cache_dir)
+                self.translator = translator
                 
                 logger.info("Loading emotion classifier...")
                 self.emotion_classifier = pipeline(
@@ -26,39 +68,87 @@ class TextEmotionAnalyzer:
                     model="j-hartmann/emotion-english-roberta-large",
                     device="cpu"
                 )
+                if quantize:
+                    quantize_pipeline(self.emotion_classifier)
                 
                 self.emotions = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+                self.batch_size = max(1, int(batch_size))
                 logger.info("TextEmotionAnalyzer initialized successfully")
                 
         except Exception as e:
             logger.error(f"Error initializing TextEmotionAnalyzer: {e}")
             raise
 
+    def warmup(self):
+        """Пробный прогон Whisper на секунде тишины и классификатора на короткой фразе (без перевода)"""
+        self.speech_model.transcribe(np.zeros(16000, dtype=np.float32), language='russian', fp16=False)
+        self.classify_texts(['warm-up'])
+
     def translate_to_english(self, text: str) -> str:
-        """Перевод текста с русского на английский"""
+        """Перевод текста с русского на английский (через кэш переводов)"""
+        if self.translator is None:
+            return text
         try:
             logger.info("Translating text to English")
             translation = self.translator.translate(text)
-            logger.info("Translation completed")
+            logger.info(f"Translation completed: {self.translator.get_stats()}")
             return translation
         except Exception as e:
             logger.error(f"Translation error: {e}")
             return text
 
-    def transcribe_audio(self, audio_path: str) -> dict:
-        """Преобразование аудио в текст"""
+    def translate_batch(self, texts):
+        """Перевод списка фраз одним вызовом (промахи кэша переводятся вместе)"""
+        if self.translator is None or not texts:
+            return list(texts)
+        try:
+            translations = self.translator.translate_batch(texts)
+            logger.info(f"Translated {len(texts)} segments: {self.translator.get_stats()}")
+            return translations
+        except Exception as e:
+            logger.error(f"Translation error: {e}")
+            return list(texts)
+
+    def transcribe_audio(self, audio) -> dict:
+        """
+        Преобразование аудио в текст
+        :param audio: путь к файлу или AudioData (16 кГц моно) - тогда ffmpeg не запускается;
+                      для AudioData после VAD распознаются только речевые участки
+        :return: {'success', 'text', 'segments': [{'start', 'end', 'text'}], 'error'};
+                 время сегментов - на шкале исходной записи
+        """
         try:
-            logger.info(f"Transcribing audio: {audio_path}")
-            result = self.speech_model.transcribe(
-                audio_path,
-                language='russian',
-                fp16=False
-            )
+            logger.info(f"Transcribing audio: {audio}")
+            if isinstance(audio, str) and self.parallel_transcriber is not None:
+                # Длительность известна только после декодирования
+                audio = load_audio(audio) or audio
+
+            if (self.parallel_transcriber is not None and not isinstance(audio, str)
+                    and audio.duration > self.long_audio_seconds):
+                result = self.parallel_transcriber.transcribe(audio)
+            else:
+                result = self.speech_model.transcribe(
+                    audio if isinstance(audio, str) else audio.samples,
+                    language='russian',
+                    fp16=False
+                )
             
-            logger.info("Transcription completed")
+            to_time = (lambda t, end=False: t) if isinstance(audio, str) else audio.to_original_time
+            segments = [
+                {
+                    'start': float(to_time(segment['start'])),
+                    'end': float(to_time(segment['end'], end=True)),
+                    'text': segment['text'].strip()
+                }
+                for segment in result.get('segments', [])
+                if segment['text'].strip()
+            ]
+
+            logger.info(f"Transcription completed: {len(segments)} segments")
             return {
                 'success': True,
                 'text': result["text"],
+                'segments': segments,
                 'error': None
             }
         except Exception as e:
@@ -66,9 +156,39 @@ class TextEmotionAnalyzer:
             return {
                 'success': False,
                 'text': None,
+                'segments': [],
                 'error': str(e)
             }
 
+    def close(self):
+        """Остановка процессов параллельного распознавания"""
+        if self.parallel_transcriber is not None:
+            self.parallel_transcriber.close()
+
+    def _to_emotions(self, predictions):
+        """Полное распределение классификатора -> словарь базовых эмоций (%)"""
+        emotions = {emotion: 0.0 for emotion in self.emotions}
+        for pred in predictions:
+            label = self.LABEL_MAPPING.get(pred['label'].lower())
+            if label is not None:
+                emotions[label] = pred['score'] * 100
+        return emotions
+
+    def classify_texts(self, texts):
+        """
+        Классификация списка английских текстов одним пакетным вызовом
+        :return: список словарей эмоций (все метки, а не только первая)
+        """
+        if not texts:
+            return []
+        predictions = self.emotion_classifier(
+            list(texts),
+            batch_size=self.batch_size,
+            top_k=None,
+            truncation=True
+        )
+        return [self._to_emotions(preds) for preds in predictions]
+
     def analyze_emotions(self, text: str) -> dict:
         """Анализ эмоций в тексте"""
         try:
@@ -77,36 +197,7 @@ class TextEmotionAnalyzer:
             english_text = self.translate_to_english(text)
             logger.info(f"Translated text: {english_text}")
             
-            # Получаем предсказания модели
-            result = self.emotion_classifier(english_text)
-            
-            # Инициализируем базовые эмоции
-            emotions = {emotion: 0.0 for emotion in self.emotions}
-            
-            # Маппинг меток эмоций
-            label_mapping = {
-                'anger': 'angry',
-                'disgust': 'disgust',
-                'fear': 'fear',
-                'joy': 'happy',
-                'sadness': 'sad',
-                'surprise': 'surprise',
-                'neutral': 'neutral'
-            }
-            
-            # Обновляем значения эмоций
-            label = result[0]['label'].lower()
-            score = result[0]['score'] * 100
-            
-            if label in label_mapping:
-                main_emotion = label_mapping[label]
-                emotions[main_emotion] = score
-                
-                # Распределяем оставшуюся вероятность
-                remaining_emotions = [e for e in emotions if e != main_emotion]
-                remaining_score = 100 - score
-                for i, emotion in enumerate(remaining_emotions):
-                    emotions[emotion] = remaining_score / len(remaining_emotions)
+            emotions = self.classify_texts([english_text])[0]
             
             logger.info("Emotion analysis completed")
             return emotions
@@ -115,13 +206,54 @@ class TextEmotionAnalyzer:
             logger.error(f"Error analyzing text emotions: {e}")
             return None
 
-    def process_audio(self, audio_path: str) -> dict:
-        """Полный процесс анализа: транскрибация и анализ эмоций"""
+    def analyze_segments(self, segments):
+        """
+        Анализ эмоций по сегментам транскрипта: все сегменты переводятся
+        и классифицируются пакетно, длинный ответ не обрезается до 512 токенов
+        :param segments: [{'start', 'end', 'text'}] из transcribe_audio
+        :return: (timeline, среднее, взвешенное по длине текста сегментов) или None
+        """
+        try:
+            texts = [segment['text'] for segment in segments]
+            logger.info(f"Starting emotion analysis of {len(texts)} segments")
+
+            predictions = self.classify_texts(self.translate_batch(texts))
+
+            timeline = []
+            weighted = np.zeros(len(self.emotions))
+            for segment, emotions in zip(segments, predictions):
+                timeline.append({
+                    'timestamp': (segment['start'] + segment['end']) / 2,
+                    'start': segment['start'],
+                    'end': segment['end'],
+                    'text': segment['text'],
+                    'emotions': emotions
+                })
+                weighted += len(segment['text']) * np.array([emotions[e] for e in self.emotions])
+
+            total = sum(len(text) for text in texts)
+            average = {
+                emotion: float(value / total) if total else 0.0
+                for emotion, value in zip(self.emotions, weighted)
+            }
+
+            logger.info("Segment emotion analysis completed")
+            return timeline, average
+
+        except Exception as e:
+            logger.error(f"Error analyzing text segments: {e}")
+            return None
+
+    def process_audio(self, audio) -> dict:
+        """
+        Полный процесс анализа: транскрибация и анализ эмоций
+        :param audio: путь к файлу или AudioData
+        """
         try:
-            logger.info(f"Starting audio processing: {audio_path}")
+            logger.info(f"Starting audio processing: {audio}")
             
             # Транскрибация
-            transcription = self.transcribe_audio(audio_path)
+            transcription = self.transcribe_audio(audio)
             if not transcription['success']:
                 logger.error(f"Transcription failed: {transcription['error']}")
                 return None
@@ -129,10 +261,17 @@ class TextEmotionAnalyzer:
             text = transcription['text']
             logger.info(f"Transcribed text: {text}")
             
-            # Анализ эмоций
-            emotions = self.analyze_emotions(text)
-            if emotions is None:
-                return None
+            # Анализ эмоций по сегментам Whisper; без сегментов - весь текст целиком
+            timeline = None
+            if transcription['segments']:
+                analysis = self.analyze_segments(transcription['segments'])
+                if analysis is None:
+                    return None
+                timeline, emotions = analysis
+            else:
+                emotions = self.analyze_emotions(text)
+                if emotions is None:
+                    return None
                 
             # Определяем доминирующую эмоцию
             dominant_emotion = max(emotions.items(), key=lambda x: x[1])[0]
@@ -142,6 +281,8 @@ class TextEmotionAnalyzer:
                 'emotions': emotions,
                 'dominant_emotion': dominant_emotion
             }
+            if timeline is not None:
+                results['timeline'] = timeline
             
             logger.info(f"Processing completed. Dominant emotion: {dominant_emotion}")
             return results
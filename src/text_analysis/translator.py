@@ -0,0 +1,232 @@
+import os
+import re
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Кэш переводов хранится вне app/static/temp, который очищается после сессии
+DEFAULT_CACHE_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'cache')
+)
+
+# Граница предложения: знак препинания и пробел
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?…])\s+')
+
+def normalize_text(text):
+    """Ключ кэша: схлопнутые пробелы, без регистра"""
+    return ' '.join(text.split()).casefold()
+
+class GoogleBackend:
+    """Онлайн-перевод через deep_translator (требует сеть)"""
+
+    name = 'google'
+
+    def __init__(self, source='ru', target='en'):
+        from deep_translator import GoogleTranslator
+        self.translator = GoogleTranslator(source=source, target=target)
+
+    def translate_batch(self, texts):
+        return [self.translator.translate(text) for text in texts]
+
+class MarianBackend:
+    """
+    Локальный перевод моделью MarianMT (Helsinki-NLP/opus-mt-*), без сети.
+    Модель загружается при первом переводе.
+    """
+
+    name = 'marian'
+
+    def __init__(self, source='ru', target='en', model=None, batch_size=16):
+        """
+        :param model: имя или путь к модели; по умолчанию Helsinki-NLP/opus-mt-{source}-{target}
+        :param batch_size: предложений в одном вызове модели
+        """
+        self.model = model or f"Helsinki-NLP/opus-mt-{source}-{target}"
+        self.batch_size = batch_size
+        self._pipeline = None
+        self._lock = threading.Lock()
+
+    def translate_batch(self, texts):
+        with self._lock:
+            if self._pipeline is None:
+                from transformers import pipeline
+                logger.info(f"Loading translation model {self.model}...")
+                self._pipeline = pipeline("translation", model=self.model, device="cpu")
+
+        results = self._pipeline(list(texts), batch_size=self.batch_size)
+        return [result['translation_text'] for result in results]
+
+class DictionaryBackend:
+    """
+    Перевод по словарю фраз; неизвестный текст возвращается без изменений.
+    Без словаря - тождественный перевод (тесты, офлайн-режим).
+    """
+
+    name = 'dictionary'
+
+    def __init__(self, source='ru', target='en', phrases=None):
+        """:param phrases: словарь {фраза: перевод}"""
+        self.phrases = {normalize_text(k): v for k, v in (phrases or {}).items()}
+
+    def translate_batch(self, texts):
+        return [self.phrases.get(normalize_text(text), text) for text in texts]
+
+BACKENDS = {
+    'google': GoogleBackend,
+    'marian': MarianBackend,
+    'dictionary': DictionaryBackend
+}
+
+class CachedTranslator:
+    """
+    Перевод с двухуровневым кэшем: LRU в памяти и SQLite на диске.
+
+    Текст разбивается на предложения, каждое переводится и кэшируется
+    отдельно, поэтому повторяющиеся фразы ("да", "нет", приветствия)
+    переводятся бэкендом только один раз - в том числе между перезапусками.
+    """
+
+    def __init__(self, backend='google', source='ru', target='en', cache_dir=DEFAULT_CACHE_DIR,
+                 max_entries=4096, **backend_options):
+        """
+        :param backend: имя бэкенда из BACKENDS или объект с методом translate_batch(texts)
+        :param cache_dir: каталог дискового кэша; None - только кэш в памяти
+        :param max_entries: размер LRU кэша в памяти
+        :param backend_options: параметры конструктора бэкенда
+        """
+        if isinstance(backend, str):
+            backend = BACKENDS[backend](source=source, target=target, **backend_options)
+        self.backend = backend
+        self.source = source
+        self.target = target
+        self.max_entries = max_entries
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self._db_path = None
+        if cache_dir:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                self._db_path = os.path.join(cache_dir, 'translations.sqlite')
+                with self._connect() as db:
+                    db.execute(
+                        "CREATE TABLE IF NOT EXISTS translations ("
+                        "backend TEXT, source TEXT, target TEXT, text TEXT, translation TEXT, "
+                        "PRIMARY KEY (backend, source, target, text))"
+                    )
+            except Exception as e:
+                logger.error(f"Translation disk cache disabled: {e}")
+                self._db_path = None
+
+    @property
+    def backend_name(self):
+        return getattr(self.backend, 'name', type(self.backend).__name__)
+
+    @contextmanager
+    def _connect(self):
+        """Соединение на одну операцию: кэш может использоваться из нескольких потоков и процессов"""
+        db = sqlite3.connect(self._db_path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def translate(self, text):
+        """Перевод текста; пустой текст возвращается как есть"""
+        if not text or not text.strip():
+            return text
+        sentences = [s for s in SENTENCE_SPLIT.split(text.strip()) if s]
+        return ' '.join(self.translate_batch(sentences))
+
+    def translate_batch(self, texts):
+        """
+        Перевод списка фраз: промахи кэша переводятся бэкендом одним вызовом
+        :return: переводы в порядке texts
+        """
+        keys = [normalize_text(text) for text in texts]
+        translations = {}
+        missing = []
+
+        for key in set(keys):
+            cached = self._get(key)
+            if cached is None:
+                missing.append(key)
+            else:
+                translations[key] = cached
+
+        self.hits += len(translations)
+        self.misses += len(missing)
+
+        if missing:
+            originals = {key: text for key, text in zip(keys, texts)}
+            results = self.backend.translate_batch([originals[key] for key in missing])
+            for key, translation in zip(missing, results):
+                translations[key] = translation
+            self._put_many(list(zip(missing, results)))
+
+        return [translations[key] for key in keys]
+
+    def _get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        if self._db_path is None:
+            return None
+        try:
+            with self._connect() as db:
+                row = db.execute(
+                    "SELECT translation FROM translations "
+                    "WHERE backend = ? AND source = ? AND target = ? AND text = ?",
+                    (self.backend_name, self.source, self.target, key)
+                ).fetchone()
+        except Exception as e:
+            logger.error(f"Translation cache read error: {e}")
+            return None
+
+        if row is not None:
+            self._remember(key, row[0])
+            return row[0]
+        return None
+
+    def _put_many(self, items):
+        for key, translation in items:
+            self._remember(key, translation)
+
+        if self._db_path is None:
+            return
+        try:
+            with self._connect() as db:
+                db.executemany(
+                    "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?)",
+                    [(self.backend_name, self.source, self.target, key, translation)
+                     for key, translation in items]
+                )
+        except Exception as e:
+            logger.error(f"Translation cache write error: {e}")
+
+    def _remember(self, key, translation):
+        with self._lock:
+            self._memory[key] = translation
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def get_stats(self):
+        """Статистика кэша"""
+        return {
+            'backend': self.backend_name,
+            'hits': self.hits,
+            'misses': self.misses,
+            'memory_entries': len(self._memory),
+            'disk_cache': self._db_path
+        }
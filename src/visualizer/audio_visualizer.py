@@ -1,51 +1,61 @@
-import librosa
-import librosa.display
-import matplotlib.pyplot as plt
 import numpy as np
 import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from visualizer.spectrogram import DisplaySpectrogram, SpectrogramAccumulator
+from visualizer.templates import AudioTemplate, DEFAULT_DPI, get_template
 
 class AudioVisualizer:
-    def __init__(self):
-        plt.style.use('dark_background')
-    
-    def create_visualization(self, audio_data, sr, emotions, save_path=None):
+    FIGSIZE = AudioTemplate.FIGSIZE
+
+    def __init__(self, dpi=DEFAULT_DPI):
+        """
+        :param dpi: разрешение сохраняемого изображения
+        """
+        self.dpi = dpi
+        # Спектрограмма занимает верхнюю половину рисунка: больше пикселей показать нельзя
+        self.spectrogram = DisplaySpectrogram(
+            width=int(self.FIGSIZE[0] * dpi),
+            height=int(self.FIGSIZE[1] * dpi / 2),
+            n_fft=2048
+        )
+
+    def get_spectrogram(self, audio_data, sr=None):
+        """
+        Спектрограмма в разрешении изображения.
+        Для AudioData результат кэшируется в audio_data.features.
+        """
+        features = getattr(audio_data, 'features', None)
+        if features is not None and 'display_spectrogram' in features:
+            return features['display_spectrogram']
+
+        if hasattr(audio_data, 'samples'):
+            spectrogram = self.spectrogram.compute(audio_data.samples, audio_data.sr)
+        else:
+            spectrogram = self.spectrogram.compute(np.asarray(audio_data, dtype=np.float32), sr)
+
+        if features is not None:
+            features['display_spectrogram'] = spectrogram
+        return spectrogram
+
+    def spectrogram_accumulator(self, num_samples, sr):
+        """Накопитель спектрограммы для потокового анализа"""
+        return SpectrogramAccumulator(self.spectrogram, num_samples, sr)
+
+    def create_visualization(self, audio_data=None, sr=None, emotions=None, save_path=None,
+                             spectrogram=None):
         """
         Создает единую визуализацию для аудио файла
-        :param audio_data: аудио данные
-        :param sr: частота дискретизации
+        :param audio_data: аудио данные (массив или AudioData)
+        :param sr: частота дискретизации (для AudioData берется из объекта)
         :param emotions: словарь с эмоциями
-        :param save_path: путь для сохранения
+        :param save_path: путь для сохранения (без него рисунок не строится)
+        :param spectrogram: готовая спектрограмма (результат DisplaySpectrogram или SpectrogramAccumulator),
+                            в этом случае audio_data не нужен
         """
-        plt.figure(figsize=(15, 10))
-        
-        # Спектрограмма
-        plt.subplot(2, 1, 1)
-        D = librosa.amplitude_to_db(np.abs(librosa.stft(audio_data)), ref=np.max)
-        librosa.display.specshow(D, sr=sr, x_axis='time', y_axis='hz')
-        plt.colorbar(format='%+2.0f dB')
-        plt.title('Audio Spectrogram')
-        
-        # Распределение эмоций
-        plt.subplot(2, 1, 2)
-        emotions_list = sorted(emotions.items())
-        labels, values = zip(*emotions_list)
-        bars = plt.bar(labels, values)
-        plt.title('Emotions Distribution from Speech')
-        plt.xticks(rotation=45)
-        plt.ylabel('Confidence (%)')
-        
-        # Добавляем значения над столбцами
-        for bar in bars:
-            height = bar.get_height()
-            plt.text(bar.get_x() + bar.get_width()/2., height,
-                    f'{height:.1f}%',
-                    ha='center', va='bottom')
-        
-        plt.tight_layout()
-        
+        if spectrogram is None:
+            spectrogram = self.get_spectrogram(audio_data, sr)
+
         if save_path:
-            os.makedirs(os.path.dirname(save_path), exist_ok=True)
-            plt.savefig(save_path, bbox_inches='tight', dpi=300)
-            plt.close()
-        else:
-            plt.show()
\ No newline at end of file
+            get_template(AudioTemplate, self.dpi).render(spectrogram, emotions, save_path)
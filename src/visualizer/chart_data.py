@@ -0,0 +1,82 @@
+import numpy as np
+
+EMOTIONS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+MODALITIES = ['video', 'audio', 'text']
+
+# Версия формата данных для графиков на клиенте
+CHART_DATA_VERSION = 1
+
+def _values(emotions, precision):
+    """Словарь эмоций -> список значений в порядке EMOTIONS"""
+    emotions = emotions or {}
+    return [round(float(emotions.get(e, 0.0)), precision) for e in EMOTIONS]
+
+def _series(scores, present, precision):
+    """
+    Массив T x 7 -> 7 рядов по T значений (по ряду на эмоцию, как трассы Plotly);
+    там, где модальности нет, - None, чтобы на графике был разрыв
+    """
+    scores = np.round(np.asarray(scores, dtype=np.float64), precision)
+    series = scores.T.tolist()
+    if present is not None and not np.all(present):
+        absent = np.flatnonzero(~np.asarray(present, dtype=bool)).tolist()
+        for row in series:
+            for i in absent:
+                row[i] = None
+    return series
+
+def build_chart_data(video_emotions, speech_emotions, text_results, fusion_results,
+                     temporal=None, precision=1):
+    """
+    Компактное описание графиков сессии для отрисовки в браузере.
+    Только агрегаты и ряды на общей временной сетке, без покадровых записей:
+    ряды хранятся по эмоциям, а не словарями по отсчетам.
+    :param temporal: результат EmotionFusion.fuse_temporal
+    :param precision: знаков после запятой
+    :return: {'version', 'emotions', 'modalities', 'bars', 'dominant', 'fused', 'timeline'}
+    """
+    bars = {
+        'video': _values(video_emotions.get('average'), precision),
+        'audio': _values(speech_emotions.get('average'), precision),
+        'text': _values(text_results.get('emotions'), precision)
+    }
+    dominant = {
+        'video': video_emotions.get('dominant_emotion'),
+        'audio': speech_emotions.get('dominant_emotion'),
+        'text': text_results.get('dominant_emotion')
+    }
+
+    fused = None
+    if fusion_results:
+        confidence = fusion_results.get('confidence_scores', {})
+        fused = {
+            'values': _values(fusion_results.get('emotions'), precision),
+            'dominant': fusion_results.get('dominant_emotion'),
+            'confidence': [round(float(confidence.get(m, 0.0)), precision) for m in MODALITIES]
+        }
+        dominant['fused'] = fused['dominant']
+
+    timeline = None
+    if temporal is not None:
+        # Шаги без модальностей - разрывы (null) в итоговой кривой
+        present = temporal['presence'].any(axis=1)
+        timeline = {
+            't': np.round(temporal['timestamps'], 3).tolist(),
+            'fused': _series(np.nan_to_num(temporal['emotions']), present, precision),
+            'dominant': np.asarray(temporal['dominant_emotion']).tolist()
+        }
+        for i, modality in enumerate(MODALITIES):
+            if temporal['presence'][:, i].any():
+                timeline[modality] = _series(
+                    temporal['scores'][:, i], temporal['presence'][:, i], precision
+                )
+
+    return {
+        'version': CHART_DATA_VERSION,
+        'emotions': EMOTIONS,
+        'modalities': MODALITIES,
+        'bars': bars,
+        'dominant': dominant,
+        'fused': fused,
+        'timeline': timeline
+    }
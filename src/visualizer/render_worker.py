@@ -0,0 +1,249 @@
+import os
+import sys
+import json
+import time
+import queue
+import pickle
+import shutil
+import logging
+import threading
+from concurrent.futures import Future
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+logger = logging.getLogger(__name__)
+
+# Версия рендереров: входит в имя файла, после изменения графиков старый кэш не используется
+RENDERER_VERSION = 2
+
+DEFAULT_CACHE_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'cache', 'renders')
+)
+
+class AudioRenderer:
+    """Спектрограмма и распределение эмоций речи (AudioVisualizer)"""
+
+    def __init__(self):
+        from visualizer.audio_visualizer import AudioVisualizer
+        self.visualizer = AudioVisualizer()
+
+    def __call__(self, payload, save_path):
+        spectrogram = payload.get('spectrogram')
+        if spectrogram is None:
+            # Аудио декодируется только при первом запросе картинки
+            from speech_recognition.audio_loader import load_audio
+            audio = load_audio(payload['audio_path'])
+            if audio is None:
+                raise ValueError(f"Cannot load audio {payload['audio_path']}")
+            spectrogram = self.visualizer.get_spectrogram(audio)
+
+        self.visualizer.create_visualization(
+            emotions=payload['emotions'],
+            save_path=save_path,
+            spectrogram=spectrogram
+        )
+
+class SessionRenderer:
+    """Сравнение модальностей и итог (EmotionVisualizer)"""
+
+    def __init__(self):
+        from visualizer.visualizer import EmotionVisualizer
+        self.visualizer = EmotionVisualizer()
+
+    def __call__(self, payload, save_path):
+        self.visualizer.create_visualization(
+            payload['video_emotions'],
+            payload['speech_emotions'],
+            payload['text_results'],
+            payload['fusion_results'],
+            save_path
+        )
+
+class FusionRenderer:
+    """Уверенность модальностей и объединенные эмоции (EmotionFusion)"""
+
+    def __init__(self):
+        from fusion.emotion_fusion import EmotionFusion
+        self.fusion = EmotionFusion()
+
+    def __call__(self, payload, save_path):
+        self.fusion.create_visualization(payload['fusion_results'], save_path)
+
+RENDERERS = {
+    'audio': AudioRenderer,
+    'session': SessionRenderer,
+    'fusion': FusionRenderer
+}
+
+class RenderWorker:
+    """
+    Отложенный рендеринг визуализаций в отдельном потоке.
+
+    Анализ только сохраняет данные для графика (submit) и сразу возвращает
+    результат. Картинка строится при первом запросе (get) единственным потоком
+    рендеринга - шаблоны фигур (visualizer.templates) не используются из разных потоков.
+    Шаблоны рисуют через Figure + FigureCanvasAgg, поэтому бэкенд pyplot процесса
+    не меняется и дисплей не нужен.
+    PNG кэшируется на диске по сессии и версии рендереров; каталоги сессий
+    старше max_age удаляются (prune) не чаще раза в prune_interval при записи.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, version=RENDERER_VERSION, renderers=None,
+                 max_age=24 * 3600, prune_interval=600):
+        """
+        :param cache_dir: каталог кэша картинок и данных для них
+        :param version: версия рендереров (часть имени файла)
+        :param renderers: {имя: класс рендерера}, по умолчанию RENDERERS
+        :param max_age: срок хранения сессии в кэше в секундах (None - без ограничения)
+        :param prune_interval: минимальный интервал между очистками кэша в секундах
+        """
+        self.cache_dir = cache_dir
+        self.version = version
+        self.renderer_classes = dict(renderers or RENDERERS)
+        self.max_age = max_age
+        self.prune_interval = prune_interval
+        self._last_prune = None
+
+        self._renderers = {}
+        self._jobs = queue.Queue()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.rendered = 0
+
+    def path(self, session_id, name):
+        """Путь к PNG в кэше"""
+        return os.path.join(self.cache_dir, session_id, f'{name}_v{self.version}.png')
+
+    def _payload_path(self, session_id, name):
+        return os.path.join(self.cache_dir, session_id, f'{name}.pkl')
+
+    def _session_dir(self, session_id):
+        """Каталог сессии в кэше; заодно удаляются устаревшие сессии"""
+        now = time.monotonic()
+        if self._last_prune is None or now - self._last_prune >= self.prune_interval:
+            self._last_prune = now
+            self.prune()
+        path = os.path.join(self.cache_dir, session_id)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def prune(self, max_age=None):
+        """
+        Удаление каталогов сессий, не изменявшихся дольше max_age секунд
+        :return: количество удаленных сессий
+        """
+        max_age = max_age if max_age is not None else self.max_age
+        if max_age is None or not os.path.isdir(self.cache_dir):
+            return 0
+
+        removed = 0
+        deadline = time.time() - max_age
+        for session_id in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, session_id)
+            try:
+                if os.path.isdir(path) and os.path.getmtime(path) < deadline:
+                    shutil.rmtree(path)
+                    removed += 1
+            except OSError as e:
+                logger.error(f"Error removing cached session {path}: {e}")
+        if removed:
+            logger.info(f"Removed {removed} expired sessions from {self.cache_dir}")
+        return removed
+
+    def submit(self, session_id, name, payload):
+        """
+        Сохранение данных для графика без рендеринга
+        :return: путь, по которому появится PNG
+        """
+        if name not in self.renderer_classes:
+            raise KeyError(f"Unknown renderer: {name}")
+
+        self._session_dir(session_id)
+        payload_path = self._payload_path(session_id, name)
+        with open(payload_path, 'wb') as f:
+            pickle.dump(payload, f)
+        return self.path(session_id, name)
+
+    def save_data(self, session_id, name, data):
+        """Сохранение JSON-данных сессии (например, данных графиков для браузера)"""
+        path = os.path.join(self._session_dir(session_id), f'{name}.json')
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temp_path, path)
+        return path
+
+    def load_data(self, session_id, name):
+        """
+        JSON-данные сессии, сохраненные save_data
+        :return: данные или None, если их нет
+        """
+        path = os.path.join(self.cache_dir, session_id, f'{name}.json')
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def request(self, session_id, name):
+        """
+        Постановка рендеринга в очередь, если картинки еще нет
+        :return: Future с путем к PNG
+        """
+        path = self.path(session_id, name)
+        with self._lock:
+            if path in self._pending:
+                return self._pending[path]
+
+            future = Future()
+            if os.path.exists(path):
+                future.set_result(path)
+                return future
+
+            self._pending[path] = future
+            self._jobs.put((session_id, name, path, future))
+            self._ensure_thread()
+            return future
+
+    def get(self, session_id, name, timeout=120):
+        """
+        Путь к готовой PNG; при первом запросе ждет рендеринга
+        :return: путь или None в случае ошибки
+        """
+        try:
+            return self.request(session_id, name).result(timeout=timeout)
+        except Exception as e:
+            logger.error(f"Error rendering {name} for session {session_id}: {e}")
+            return None
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='render-worker', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        """Цикл потока рендеринга"""
+        while True:
+            session_id, name, path, future = self._jobs.get()
+            try:
+                with open(self._payload_path(session_id, name), 'rb') as f:
+                    payload = pickle.load(f)
+
+                if name not in self._renderers:
+                    self._renderers[name] = self.renderer_classes[name]()
+
+                # Запись во временный файл и атомарная замена: недорисованный PNG не попадет в кэш
+                temp_path = path[:-len('.png')] + '.tmp.png'
+                self._renderers[name](payload, temp_path)
+                if not os.path.exists(temp_path):
+                    raise RuntimeError("renderer did not produce a file")
+                os.replace(temp_path, path)
+
+                self.rendered += 1
+                logger.info(f"Rendered {path}")
+                future.set_result(path)
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._pending.pop(path, None)
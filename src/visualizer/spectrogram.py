@@ -0,0 +1,144 @@
+import logging
+from math import ceil
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.fft import rfft
+from scipy.signal import get_window
+
+logger = logging.getLogger(__name__)
+
+class DisplaySpectrogram:
+    """
+    Спектрограмма в разрешении итогового изображения.
+
+    Шаг кадров выбирается по ширине изображения, частотные бины сводятся
+    максимумом к высоте изображения, все вычисления во float32.
+    Стоимость построения определяется размером картинки, а не длиной записи.
+    """
+
+    def __init__(self, width=2048, height=256, n_fft=1024, top_db=80.0):
+        """
+        :param width: максимальное количество столбцов (кадров) спектрограммы
+        :param height: максимальное количество частотных полос
+        :param n_fft: длина окна FFT
+        :param top_db: динамический диапазон в дБ ниже максимума
+        """
+        self.width = max(1, int(width))
+        self.height = max(1, int(height))
+        self.n_fft = n_fft
+        self.top_db = top_db
+        self.window = get_window('hann', n_fft).astype(np.float32)
+
+    def frame_hop(self, num_samples):
+        """Шаг кадров, при котором спектрограмма укладывается в width столбцов"""
+        return max(self.n_fft // 4, ceil(num_samples / self.width))
+
+    def compute(self, samples, sr):
+        """
+        Спектрограмма сигнала целиком
+        :param samples: одномерный массив отсчетов
+        :return: словарь из finish()
+        """
+        accumulator = SpectrogramAccumulator(self, len(samples), sr)
+        # Блоками, чтобы кадры не копировались для всего сигнала сразу
+        block = accumulator.hop * 256
+        for start in range(0, len(samples), block):
+            accumulator.add(samples[start:start + block])
+        return accumulator.finish()
+
+    def pool_bins(self, magnitudes):
+        """Сведение частотных бинов (последняя ось) максимумом к height полосам"""
+        bins = magnitudes.shape[-1]
+        if bins <= self.height:
+            return magnitudes
+        edges = np.unique(np.linspace(0, bins, self.height + 1).astype(int)[:-1])
+        return np.maximum.reduceat(magnitudes, edges, axis=-1)
+
+    def to_result(self, columns, sr, duration, hop):
+        """
+        :param columns: амплитуды (кадры x полосы)
+        :return: {'db': полосы x кадры float32, 'sr', 'duration', 'max_freq', 'hop'}
+        """
+        magnitudes = columns.T.astype(np.float32, copy=False)
+        reference = float(magnitudes.max()) if magnitudes.size else 0.0
+
+        db = 20.0 * np.log10(np.maximum(magnitudes, 1e-10) / max(reference, 1e-10))
+        db = np.maximum(db, -self.top_db).astype(np.float32, copy=False)
+
+        return {
+            'db': db,
+            'sr': sr,
+            'duration': duration,
+            'max_freq': sr / 2,
+            'hop': hop
+        }
+
+class SpectrogramAccumulator:
+    """
+    Накопление спектрограммы по чанкам: для потокового анализа, когда
+    сигнал целиком в памяти не хранится. Кадры центрированы, как в librosa.
+    """
+
+    def __init__(self, engine, num_samples, sr):
+        """
+        :param engine: DisplaySpectrogram
+        :param num_samples: ожидаемая длина сигнала (для выбора шага кадров)
+        :param sr: частота дискретизации
+        """
+        self.engine = engine
+        self.sr = sr
+        self.num_samples = 0
+        self.hop = engine.frame_hop(num_samples)
+
+        half = engine.n_fft // 2
+        # Буфер начинается с нулевого дополнения перед первым кадром
+        self._buffer = np.zeros(half, dtype=np.float32)
+        self._buffer_start = -half
+        self._next_center = 0
+        self._columns = []
+
+    def add(self, chunk):
+        """Добавление очередного чанка сигнала"""
+        self.num_samples += len(chunk)
+        self._consume(np.asarray(chunk, dtype=np.float32))
+
+    def _consume(self, chunk):
+        n_fft = self.engine.n_fft
+        half = n_fft // 2
+
+        self._buffer = np.concatenate((self._buffer, chunk))
+        buffer_end = self._buffer_start + len(self._buffer)
+        if self._next_center + half > buffer_end:
+            return
+
+        # Все кадры, которые целиком помещаются в буфер
+        offset = self._next_center - half - self._buffer_start
+        count = (buffer_end - self._next_center - half) // self.hop + 1
+        frames = sliding_window_view(self._buffer[offset:], n_fft)[::self.hop][:count]
+
+        spectrum = np.abs(rfft(frames * self.engine.window, axis=1))
+        self._columns.append(self.engine.pool_bins(spectrum.astype(np.float32, copy=False)))
+
+        self._next_center += count * self.hop
+        keep_from = self._next_center - half
+        self._buffer = self._buffer[keep_from - self._buffer_start:]
+        self._buffer_start = keep_from
+
+    def finish(self):
+        """Завершение: дополнение нулями в конце и сборка спектрограммы"""
+        half = self.engine.n_fft // 2
+        # Последний кадр центрирован не дальше конца сигнала
+        self._consume(np.zeros(half, dtype=np.float32))
+
+        if self._columns:
+            columns = np.concatenate(self._columns)
+        else:
+            columns = np.zeros((0, min(self.engine.height, half + 1)), dtype=np.float32)
+
+        return self.engine.to_result(
+            columns,
+            sr=self.sr,
+            duration=self.num_samples / self.sr,
+            hop=self.hop
+        )
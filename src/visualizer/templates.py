@@ -0,0 +1,270 @@
+import os
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+
+import numpy as np
+import matplotlib.style
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+logger = logging.getLogger(__name__)
+
+EMOTIONS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+
+# DPI по умолчанию: 15x10 дюймов -> 1500x1000 пикселей, достаточно для страницы результатов
+DEFAULT_DPI = 100
+
+DOMINANT_COLOR = '#FF3333'
+
+class FigureTemplate(ABC):
+    """
+    Шаблон графика: фигура, оси, столбцы и подписи создаются один раз
+    объектным API matplotlib (без глобального состояния pyplot), а при
+    рендеринге обновляются только высоты, цвета и тексты.
+    Рендеринг одного шаблона сериализуется блокировкой.
+    """
+
+    FIGSIZE = (15, 10)
+
+    def __init__(self, dpi=DEFAULT_DPI):
+        self.dpi = dpi
+        self._lock = threading.Lock()
+        with matplotlib.style.context('dark_background'):
+            self.figure = Figure(figsize=self.FIGSIZE, dpi=dpi)
+            FigureCanvasAgg(self.figure)
+            self._build()
+            # Раскладка считается один раз для шаблона, а не для каждого рендеринга
+            self.figure.tight_layout()
+        self.renders = 0
+
+    @abstractmethod
+    def _build(self):
+        """Создание осей, столбцов и подписей шаблона"""
+
+    def _bar_group(self, axes, positions, width, labels=None, **kwargs):
+        """Столбцы с нулевой высотой и текстовые подписи над ними"""
+        bars = axes.bar(positions, np.zeros(len(positions)), width, **kwargs)
+        texts = [
+            axes.text(bar.get_x() + bar.get_width() / 2., 0, '', ha='center', va='bottom')
+            for bar in bars
+        ] if labels else []
+        return bars, texts
+
+    @staticmethod
+    def _set_heights(bars, texts, values):
+        for i, (bar, value) in enumerate(zip(bars, values)):
+            bar.set_height(value)
+            if texts:
+                texts[i].set_y(value)
+                texts[i].set_text(f'{value:.1f}%')
+
+    @staticmethod
+    def _fit(axes, values, minimum=1.0):
+        """Масштаб оси Y под подписи над столбцами"""
+        top = max(float(np.max(values)) if np.size(values) else 0.0, minimum)
+        axes.set_ylim(0, top * 1.12)
+
+    def save(self, save_path):
+        """Сохранение текущего состояния фигуры"""
+        os.makedirs(os.path.dirname(save_path) or '.', exist_ok=True)
+        self.figure.savefig(save_path, dpi=self.dpi)
+        self.renders += 1
+
+class SessionTemplate(FigureTemplate):
+    """Сравнение модальностей и итоговые эмоции (EmotionVisualizer)"""
+
+    MODALITIES = [('Video', '#FF9999'), ('Audio', '#99FF99'), ('Text', '#9999FF')]
+    FUSED_COLOR = '#FFB266'
+
+    def _build(self):
+        x = np.arange(len(EMOTIONS))
+        width = 0.25
+
+        self.modality_axes, self.fused_axes = self.figure.subplots(2, 1)
+
+        axes = self.modality_axes
+        self.modality_bars = [
+            self._bar_group(axes, x + (i - 1) * width, width, label=label, color=color)[0]
+            for i, (label, color) in enumerate(self.MODALITIES)
+        ]
+        axes.set_xlabel('Emotions')
+        axes.set_ylabel('Confidence (%)')
+        axes.set_title('Emotion Distribution by Modality')
+        axes.set_xticks(x, EMOTIONS, rotation=45)
+        axes.legend()
+
+        axes = self.fused_axes
+        self.fused_bars, self.fused_texts = self._bar_group(axes, x, 0.8, labels=True, color=self.FUSED_COLOR)
+        axes.set_title('Fused Emotions Analysis\nDominant: Unknown')
+        axes.set_xlabel('Emotions')
+        axes.set_ylabel('Confidence (%)')
+        axes.set_xticks(x, EMOTIONS, rotation=45)
+
+    def render(self, modality_values, fused_values, dominant_emotion, save_path):
+        """
+        :param modality_values: три списка значений (видео, аудио, текст) в порядке EMOTIONS
+        :param fused_values: итоговые значения в порядке EMOTIONS
+        """
+        with self._lock:
+            for bars, values in zip(self.modality_bars, modality_values):
+                self._set_heights(bars, None, values)
+            self._fit(self.modality_axes, modality_values)
+
+            self._set_heights(self.fused_bars, self.fused_texts, fused_values)
+            self._fit(self.fused_axes, fused_values)
+            for emotion, bar in zip(EMOTIONS, self.fused_bars):
+                bar.set_color(DOMINANT_COLOR if emotion == dominant_emotion else self.FUSED_COLOR)
+            self.fused_axes.set_title('Fused Emotions Analysis\nDominant: ' + dominant_emotion.capitalize())
+
+            self.save(save_path)
+
+class FusionTemplate(FigureTemplate):
+    """Уверенность модальностей и объединенные эмоции (EmotionFusion)"""
+
+    MODALITIES = ['video', 'audio', 'text']
+
+    def _build(self):
+        self.confidence_axes, self.emotion_axes = self.figure.subplots(2, 1)
+
+        axes = self.confidence_axes
+        self.confidence_bars, self.confidence_texts = self._bar_group(
+            axes, np.arange(len(self.MODALITIES)), 0.8, labels=True
+        )
+        axes.set_xticks(np.arange(len(self.MODALITIES)), self.MODALITIES)
+        axes.set_title('Confidence by Modality')
+        axes.set_ylabel('Confidence Score (%)')
+
+        axes = self.emotion_axes
+        x = np.arange(len(EMOTIONS))
+        self.emotion_bars, self.emotion_texts = self._bar_group(axes, x, 0.8, labels=True)
+        self.default_color = self.emotion_bars[0].get_facecolor()
+        axes.set_xticks(x, EMOTIONS, rotation=45)
+        axes.set_title('Fused Emotions (Dominant: Unknown)')
+        axes.set_ylabel('Confidence (%)')
+
+    def render(self, confidence_values, emotion_values, dominant_emotion, save_path):
+        """
+        :param confidence_values: уверенность модальностей в порядке MODALITIES
+        :param emotion_values: итоговые эмоции в порядке EMOTIONS
+        """
+        with self._lock:
+            self._set_heights(self.confidence_bars, self.confidence_texts, confidence_values)
+            self._fit(self.confidence_axes, confidence_values)
+
+            self._set_heights(self.emotion_bars, self.emotion_texts, emotion_values)
+            self._fit(self.emotion_axes, emotion_values)
+            for emotion, bar in zip(EMOTIONS, self.emotion_bars):
+                bar.set_color(DOMINANT_COLOR if emotion == dominant_emotion else self.default_color)
+            self.emotion_axes.set_title(f'Fused Emotions (Dominant: {dominant_emotion.capitalize()})')
+
+            self.save(save_path)
+
+class AudioTemplate(FigureTemplate):
+    """Спектрограмма и распределение эмоций речи (AudioVisualizer)"""
+
+    def __init__(self, dpi=DEFAULT_DPI, top_db=80.0):
+        self.top_db = top_db
+        super().__init__(dpi)
+
+    def _build(self):
+        self.spectrogram_axes, self.emotion_axes = self.figure.subplots(2, 1)
+
+        axes = self.spectrogram_axes
+        # Спектрограмма нормирована к максимуму, поэтому шкала цвета фиксирована
+        self.image = axes.imshow(
+            np.full((2, 2), -self.top_db, dtype=np.float32), aspect='auto', origin='lower',
+            cmap='magma', interpolation='nearest', vmin=-self.top_db, vmax=0, extent=(0, 1, 0, 1)
+        )
+        axes.set_xlabel('Time (s)')
+        axes.set_ylabel('Hz')
+        axes.set_title('Audio Spectrogram')
+        self.figure.colorbar(self.image, ax=axes, format='%+2.0f dB')
+
+        axes = self.emotion_axes
+        x = np.arange(len(EMOTIONS))
+        # Эмоции по алфавиту, как в исходной визуализации
+        self.labels = sorted(EMOTIONS)
+        self.emotion_bars, self.emotion_texts = self._bar_group(axes, x, 0.8, labels=True)
+        axes.set_xticks(x, self.labels, rotation=45)
+        axes.set_title('Emotions Distribution from Speech')
+        axes.set_ylabel('Confidence (%)')
+
+    def render(self, spectrogram, emotions, save_path):
+        """
+        :param spectrogram: результат DisplaySpectrogram
+        :param emotions: словарь эмоций (%)
+        """
+        with self._lock:
+            self.image.set_data(spectrogram['db'])
+            self.image.set_extent((0, spectrogram['duration'], 0, spectrogram['max_freq']))
+            self.spectrogram_axes.set_xlim(0, spectrogram['duration'])
+            self.spectrogram_axes.set_ylim(0, spectrogram['max_freq'])
+
+            values = [emotions.get(label, 0.0) for label in self.labels]
+            self._set_heights(self.emotion_bars, self.emotion_texts, values)
+            self._fit(self.emotion_axes, values)
+
+            self.save(save_path)
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+def get_template(template_class, dpi=DEFAULT_DPI):
+    """Шаблон строится один раз на процесс для каждого класса и DPI"""
+    key = (template_class, dpi)
+    with _templates_lock:
+        if key not in _templates:
+            _templates[key] = template_class(dpi=dpi)
+        return _templates[key]
+
+def benchmark(renders=50, dpi=DEFAULT_DPI, output_dir=None):
+    """
+    Скорость рендеринга (рендеров в секунду): шаблоны против построения
+    фигуры с нуля с tight_layout и bbox_inches='tight', оба при одном dpi,
+    чтобы сравнивалось только построение фигуры
+    """
+    import tempfile
+    output_dir = output_dir or tempfile.mkdtemp()
+    os.makedirs(output_dir, exist_ok=True)
+    rng = np.random.default_rng(0)
+
+    def sample():
+        values = rng.random((4, len(EMOTIONS))) * 100
+        return values[:3], values[3]
+
+    def from_scratch(path):
+        modality_values, fused_values = sample()
+        with matplotlib.style.context('dark_background'):
+            figure = Figure(figsize=FigureTemplate.FIGSIZE)
+            FigureCanvasAgg(figure)
+            top, bottom = figure.subplots(2, 1)
+            x = np.arange(len(EMOTIONS))
+            for i, values in enumerate(modality_values):
+                top.bar(x + (i - 1) * 0.25, values, 0.25)
+            for bar in bottom.bar(x, fused_values):
+                bottom.text(bar.get_x() + bar.get_width() / 2., bar.get_height(),
+                            f'{bar.get_height():.1f}%', ha='center', va='bottom')
+            figure.tight_layout()
+            figure.savefig(path, bbox_inches='tight', dpi=dpi)
+
+    def templated(path):
+        modality_values, fused_values = sample()
+        get_template(SessionTemplate, dpi).render(
+            modality_values, fused_values, EMOTIONS[int(np.argmax(fused_values))], path
+        )
+
+    results = {}
+    for name, render in (('from_scratch', from_scratch), ('template', templated)):
+        render(os.path.join(output_dir, f'warmup_{name}.png'))
+        start = time.perf_counter()
+        for i in range(renders):
+            render(os.path.join(output_dir, f'{name}_{i}.png'))
+        results[name] = renders / (time.perf_counter() - start)
+        logger.info(f"{name} (dpi {dpi}): {results[name]:.1f} renders/s")
+    return results
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    benchmark()
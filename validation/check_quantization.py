@@ -0,0 +1,186 @@
+"""
+Проверка точности и скорости режима динамической int8-квантизации.
+
+Прогоняет fp32 и квантизованный вариант каждой трансформерной модели на
+валидационных наборах из ноутбуков и сообщает точность, согласие двух
+вариантов, задержку на образец и размер модели:
+
+- wav2vec2 (эмоции речи) на RAVDESS, метки из имен файлов
+- RoBERTa (эмоции текста) на GoEmotions, основная метка среди 7 базовых эмоций
+- Whisper small на аудио RAVDESS: сходство транскриптов fp32 и int8 (без меток)
+
+Запуск (из каталога validation/):
+    python check_quantization.py --ravdess RAVDESS --goemotions GoEmotions --sample-size 200
+"""
+import os
+import sys
+import json
+import time
+import difflib
+import argparse
+import warnings
+
+import numpy as np
+import torch
+import whisper
+from transformers import pipeline
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from models.quantization import quantize_linear_layers, quantize_pipeline, model_size_mb
+from speech_recognition.audio_loader import load_audio
+
+SPEECH_MODEL = "ehcalabres/wav2vec2-lg-xlsr-en-speech-emotion-recognition"
+TEXT_MODEL = "j-hartmann/emotion-english-roberta-large"
+
+# Метки как в validate_ravdess.ipynb / validate_Goemetions.ipynb
+RAVDESS_EMOTIONS = {
+    '01': 'neutral', '02': 'calm', '03': 'happy', '04': 'sad',
+    '05': 'angry', '06': 'fear', '07': 'disgust', '08': 'surprise'
+}
+SPEECH_LABELS = {'fearful': 'fear', 'surprised': 'surprise'}
+GOEMOTIONS_COLUMNS = ['anger', 'joy', 'sadness', 'fear', 'disgust', 'surprise', 'neutral']
+
+def load_ravdess(data_dir, sample_size):
+    data = []
+    for root, _, files in os.walk(data_dir):
+        for file in files:
+            parts = file.split("-")
+            if file.endswith('.wav') and len(parts) > 2 and parts[2] in RAVDESS_EMOTIONS:
+                data.append((os.path.join(root, file), RAVDESS_EMOTIONS[parts[2]]))
+    data.sort()
+    print(f"Loaded {len(data)} RAVDESS files, using {min(sample_size, len(data))}")
+    return data[:sample_size]
+
+def load_goemotions(data_dir, sample_size):
+    import pandas as pd
+    files = [os.path.join(data_dir, f) for f in os.listdir(data_dir) if f.endswith('.csv')]
+    data = pd.concat([pd.read_csv(file) for file in files], ignore_index=True)
+
+    # Только строки с одной из базовых эмоций
+    data = data[data[GOEMOTIONS_COLUMNS].sum(axis=1) > 0]
+    data = data.sample(min(sample_size, len(data)), random_state=42)
+    labels = data[GOEMOTIONS_COLUMNS].idxmax(axis=1)
+    print(f"Using {len(data)} GoEmotions samples")
+    return list(zip(data['text'], labels))
+
+def run(predict, samples):
+    """Предсказание по одному образцу, как в отдельном запросе: предсказания и задержки"""
+    predictions, latencies = [], []
+    with torch.inference_mode():
+        for sample in samples:
+            start = time.perf_counter()
+            predictions.append(predict(sample))
+            latencies.append(time.perf_counter() - start)
+    return predictions, latencies
+
+def summarize(name, labels, fp32, int8, score=None):
+    """Точность обоих вариантов, их согласие и задержка"""
+    (fp32_predictions, fp32_latencies), (int8_predictions, int8_latencies) = fp32, int8
+    score = score or (lambda a, b: float(a == b))
+
+    result = {
+        'samples': len(fp32_predictions),
+        'agreement': float(np.mean([score(a, b) for a, b in zip(fp32_predictions, int8_predictions)])),
+        'fp32_latency_ms': 1000 * float(np.median(fp32_latencies)),
+        'int8_latency_ms': 1000 * float(np.median(int8_latencies)),
+    }
+    if labels is not None:
+        result['fp32_accuracy'] = float(np.mean([p == l for p, l in zip(fp32_predictions, labels)]))
+        result['int8_accuracy'] = float(np.mean([p == l for p, l in zip(int8_predictions, labels)]))
+    result['speedup'] = result['fp32_latency_ms'] / max(result['int8_latency_ms'], 1e-9)
+
+    print(f"\n{name}")
+    for key, value in result.items():
+        print(f"  {key:18s} {value:.3f}" if isinstance(value, float) else f"  {key:18s} {value}")
+    return result
+
+def check_speech(samples):
+    labels = [label for _, label in samples]
+    audio = [load_audio(path).samples for path, _ in samples]
+
+    def predict_with(classifier):
+        def predict(signal):
+            top = classifier({'raw': signal, 'sampling_rate': 16000}, top_k=1)[0]['label'].lower()
+            return SPEECH_LABELS.get(top, top)
+        return predict
+
+    classifier = pipeline("audio-classification", model=SPEECH_MODEL, device="cpu")
+    size = model_size_mb(classifier.model)
+    fp32 = run(predict_with(classifier), audio)
+    quantize_pipeline(classifier)
+    int8 = run(predict_with(classifier), audio)
+
+    result = summarize("wav2vec2 / RAVDESS", labels, fp32, int8)
+    result.update(fp32_size_mb=size, int8_size_mb=model_size_mb(classifier.model))
+    return result
+
+def check_text(samples):
+    texts = [text for text, _ in samples]
+    labels = [label for _, label in samples]
+
+    def predict_with(classifier):
+        return lambda text: classifier(text)[0]['label'].lower()
+
+    classifier = pipeline("text-classification", model=TEXT_MODEL, device="cpu")
+    size = model_size_mb(classifier.model)
+    fp32 = run(predict_with(classifier), texts)
+    quantize_pipeline(classifier)
+    int8 = run(predict_with(classifier), texts)
+
+    result = summarize("RoBERTa / GoEmotions", labels, fp32, int8)
+    result.update(fp32_size_mb=size, int8_size_mb=model_size_mb(classifier.model))
+    return result
+
+def check_whisper(samples):
+    audio = [load_audio(path).samples for path, _ in samples]
+
+    def predict_with(model):
+        return lambda signal: model.transcribe(signal, language='english', fp16=False)['text'].strip().lower()
+
+    def similarity(a, b):
+        return difflib.SequenceMatcher(None, a.split(), b.split()).ratio()
+
+    model = whisper.load_model("small", device="cpu")
+    size = model_size_mb(model)
+    fp32 = run(predict_with(model), audio)
+    model = quantize_linear_layers(model)
+    int8 = run(predict_with(model), audio)
+
+    result = summarize("Whisper small / RAVDESS (word similarity fp32 vs int8)", None, fp32, int8, similarity)
+    result.update(fp32_size_mb=size, int8_size_mb=model_size_mb(model))
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ravdess', default='RAVDESS')
+    parser.add_argument('--goemotions', default='GoEmotions')
+    parser.add_argument('--sample-size', type=int, default=200)
+    parser.add_argument('--whisper-samples', type=int, default=20)
+    parser.add_argument('--threads', type=int, default=None, help='потоков torch (по умолчанию - как в torch)')
+    parser.add_argument('--output', default=os.path.join('results', 'quantization.json'))
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    report = {'threads': torch.get_num_threads()}
+    if os.path.isdir(args.ravdess):
+        ravdess = load_ravdess(args.ravdess, args.sample_size)
+        report['speech'] = check_speech(ravdess)
+        report['whisper'] = check_whisper(ravdess[:args.whisper_samples])
+    else:
+        print(f"RAVDESS not found at {args.ravdess}, skipping speech and Whisper")
+
+    if os.path.isdir(args.goemotions):
+        report['text'] = check_text(load_goemotions(args.goemotions, args.sample_size))
+    else:
+        print(f"GoEmotions not found at {args.goemotions}, skipping text")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport saved at: {args.output}")
+
+if __name__ == "__main__":
+    main()